@@ -0,0 +1,265 @@
+import os
+import time
+import threading
+import contextvars
+from collections import Counter
+from urllib.parse import urlparse, quote
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from partage import VolUnique
+
+# --- CONFIGURATION API ALBION ---
+API_BASE = os.environ.get("ALBION_API_BASE", "https://gameinfo-ams.albiononline.com/api/gameinfo")
+HEADERS = {'User-Agent': 'Mozilla/5.0'}
+
+REQUETES_PAR_SECONDE = 10   # Limite globale, partagée par tous les threads du client
+NB_THREADS = 8
+TIMEOUT_S = 10
+NB_ESSAIS = 4               # 1 tentative + 3 reprises sur 429 / 5xx / erreur réseau
+BACKOFF_S = 0.5
+CODES_A_REESSAYER = {429, 500, 502, 503, 504}
+
+# Résolution par effectif de guilde : une guilde vue SEUIL_GUILDE fois est chargée en une requête
+SEUIL_GUILDE = 3
+TAILLE_ECHANTILLON = 10     # Joueurs résolus un par un pour repérer les guildes dominantes
+NB_GUILDES_MAX = 5
+
+
+def _fiche_joueur(d, craft_fame=None):
+    """Fiche du scanner à partir d'un joueur gameinfo (détail /players ou membre /guilds/{id}/members)."""
+    if craft_fame is None:
+        craft_fame = d.get('LifetimeStatistics', {}).get('Crafting', {}).get('Total') or d.get('CraftFame') or 0
+    return {
+        "Pseudo": d.get('Name'),
+        "Guilde": d.get('GuildName') or "Aucune",
+        "Alliance": d.get('AllianceName') or "-",
+        "Craft Fame": craft_fame,
+        "Trouve": True
+    }
+
+
+class LimiteurDebit:
+    """Limiteur global de débit (requêtes/seconde), partagé entre threads."""
+
+    def __init__(self, par_seconde):
+        self.intervalle = 1.0 / par_seconde if par_seconde and par_seconde > 0 else 0.0
+        self._prochain = 0.0
+        self._verrou = threading.Lock()
+
+    def attendre(self):
+        """Bloque jusqu'au prochain créneau disponible."""
+        if not self.intervalle:
+            return
+        with self._verrou:
+            maintenant = time.monotonic()
+            creneau = max(self._prochain, maintenant)
+            self._prochain = creneau + self.intervalle
+        if creneau > maintenant:
+            time.sleep(creneau - maintenant)
+
+
+class ClientAlbion:
+    """Client gameinfo : session HTTP keep-alive, limiteur de débit, reprises avec backoff et timeouts.
+
+    Si un cache (CacheJoueurs) est fourni, les fiches résolues y sont lues et enregistrées. Un même joueur ou
+    une même guilde demandés en même temps (deux scans, deux sessions) ne sont interrogés qu'une fois.
+    """
+
+    def __init__(self, requetes_par_seconde=REQUETES_PAR_SECONDE, nb_threads=NB_THREADS,
+                 timeout=TIMEOUT_S, nb_essais=NB_ESSAIS, api_base=API_BASE, cache=None):
+        self.api_base = api_base.rstrip('/')
+        self.serveur = urlparse(self.api_base).netloc
+        self.cache = cache
+        self.nb_threads = nb_threads
+        self.timeout = timeout
+        self.nb_essais = nb_essais
+        self.limiteur = LimiteurDebit(requetes_par_seconde)
+        self._en_vol = VolUnique("api_albion_en_vol")
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adaptateur = HTTPAdapter(pool_connections=nb_threads, pool_maxsize=nb_threads)
+        self.session.mount("https://", adaptateur)
+        self.session.mount("http://", adaptateur)
+
+    def _get(self, chemin, params=None):
+        """GET limité en débit ; réessaie sur 429/5xx en respectant Retry-After. Retourne la réponse ou None."""
+        for essai in range(self.nb_essais):
+            self.limiteur.attendre()
+            try:
+                resp = self.session.get(f"{self.api_base}{chemin}", params=params, timeout=self.timeout)
+            except requests.RequestException:
+                resp = None
+            if resp is not None and resp.status_code not in CODES_A_REESSAYER:
+                return resp
+            if essai == self.nb_essais - 1:
+                return resp
+            attente = BACKOFF_S * (2 ** essai)
+            if resp is not None:
+                try: attente = max(attente, float(resp.headers.get('Retry-After', 0)))
+                except ValueError: pass
+            time.sleep(attente)
+        return None
+
+    def _resoudre(self, pseudo):
+        """Interroge l'API. Retourne (fiche, fiable) ; une fiche non fiable (erreur réseau/serveur) n'est pas mise en cache."""
+        try:
+            resp = self._get("/search", params={'q': pseudo})
+            if resp is not None and resp.status_code == 200:
+                data = resp.json()
+                candidats = [p for p in data.get('players', []) if p['Name'].lower() == pseudo.lower()]
+                if not candidats: return {"Pseudo": pseudo, "Trouve": False}, True
+                meilleur_fame = -1
+                infos_meilleur = {}
+                for p in candidats[:3]:
+                    try:
+                        r_det = self._get(f"/players/{p['Id']}")
+                        if r_det is not None and r_det.status_code == 200:
+                            d = r_det.json()
+                            val_fame = d.get('LifetimeStatistics', {}).get('Crafting', {}).get('Total') or d.get('CraftFame') or 0
+                            if val_fame > meilleur_fame:
+                                meilleur_fame = val_fame
+                                infos_meilleur = d
+                    except: pass
+                if infos_meilleur:
+                    return _fiche_joueur(infos_meilleur, meilleur_fame), True
+            return {"Pseudo": pseudo, "Trouve": False}, False
+        except: return {"Pseudo": pseudo, "Trouve": False}, False
+
+    def get_player_stats(self, pseudo, force=False):
+        """Résout un pseudo : parmi les homonymes exacts, retient celui qui a la plus forte Craft Fame.
+
+        force : ignore le cache et réinterroge l'API (le cache est tout de même mis à jour).
+        """
+        if self.cache is not None and not force:
+            en_cache = self.cache.lire(self.serveur, [pseudo])
+            if pseudo in en_cache: return en_cache[pseudo]
+        def resoudre():
+            fiche, fiable = self._resoudre(pseudo)
+            if self.cache is not None and fiable:
+                self.cache.ecrire(self.serveur, pseudo, fiche)
+            return fiche
+        return self._en_vol.executer(("joueur", pseudo), resoudre)
+
+    def membres_guilde(self, nom_guilde):
+        """Effectif d'une guilde en une requête (/guilds/{id}/members) : {pseudo minuscule: fiche}, ou None en cas d'échec."""
+        return self._en_vol.executer(("guilde", nom_guilde.lower()), lambda: self._charger_membres(nom_guilde))
+
+    def _charger_membres(self, nom_guilde):
+        try:
+            resp = self._get("/search", params={'q': nom_guilde})
+            if resp is None or resp.status_code != 200:
+                return None
+            guildes = [g for g in resp.json().get('guilds', []) if str(g.get('Name', '')).lower() == nom_guilde.lower()]
+            if not guildes:
+                return None
+            membres = {}
+            for g in guildes:
+                r_membres = self._get(f"/guilds/{quote(str(g['Id']))}/members")
+                if r_membres is None or r_membres.status_code != 200:
+                    return None
+                for d in r_membres.json():
+                    membres[str(d.get('Name', '')).lower()] = _fiche_joueur(d)
+            return membres
+        except Exception:
+            return None
+
+    def _resoudre_un_par_un(self, pseudos, indices, terminer, arret=None, force=False):
+        """Résolution individuelle en parallèle ; terminer(i, fiche) est appelé depuis le thread appelant.
+
+        Sans force, le cache est relu pseudo par pseudo : une fiche obtenue entre-temps par un autre scan
+        n'est pas redemandée à l'API.
+        """
+        if not indices or (arret is not None and arret.is_set()):
+            return
+        with ThreadPoolExecutor(max_workers=self.nb_threads) as pool:
+            # Chaque tâche hérite du contexte de l'appelant (ex : profil d'instrumentation du rerun)
+            futures = {
+                pool.submit(contextvars.copy_context().run, self.get_player_stats, pseudos[i], force): i
+                for i in indices
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                try: fiche = future.result()
+                except Exception: fiche = {"Pseudo": pseudos[i], "Trouve": False}
+                terminer(i, fiche)
+                if arret is not None and arret.is_set():
+                    # Les requêtes pas encore parties sont abandonnées ; celles en vol se terminent
+                    for f in futures: f.cancel()
+                    break
+
+    def _resoudre_par_guildes(self, pseudos, a_resoudre, resultats, terminer, arret=None, force=False):
+        """Résout le plus de joueurs possible via l'effectif de leur guilde. Retourne les indices restants.
+
+        Une guilde est chargée dès qu'elle revient au moins SEUIL_GUILDE fois parmi les fiches déjà connues
+        (cache) ou dans un échantillon de joueurs résolus un par un.
+        """
+        def guildes_frequentes(fiches):
+            compteur = Counter(f.get('Guilde') for f in fiches if f and f.get('Trouve') and f.get('Guilde') not in (None, "Aucune"))
+            return [g for g, nb in compteur.most_common() if nb >= SEUIL_GUILDE]
+
+        essayees = set()
+        file_guildes = guildes_frequentes(resultats)
+        while a_resoudre and len(essayees) < NB_GUILDES_MAX and not (arret is not None and arret.is_set()):
+            if not file_guildes:
+                echantillon, a_resoudre = a_resoudre[:TAILLE_ECHANTILLON], a_resoudre[TAILLE_ECHANTILLON:]
+                self._resoudre_un_par_un(pseudos, echantillon, terminer, arret, force)
+                file_guildes = [g for g in guildes_frequentes(resultats) if g.lower() not in essayees]
+                if not file_guildes:
+                    break
+            nom_guilde = file_guildes.pop(0)
+            if nom_guilde.lower() in essayees:
+                continue
+            essayees.add(nom_guilde.lower())
+            membres = self.membres_guilde(nom_guilde)
+            if not membres:
+                continue
+            restants = []
+            for i in a_resoudre:
+                fiche = membres.get(pseudos[i].lower())
+                if fiche is None:
+                    restants.append(i)
+                    continue
+                if self.cache is not None:
+                    self.cache.ecrire(self.serveur, pseudos[i], fiche)
+                terminer(i, fiche)
+            a_resoudre = restants
+        return a_resoudre
+
+    def resoudre_joueurs(self, pseudos, on_progress=None, force=False, par_guilde=True, on_resultat=None, arret=None):
+        """Résout une liste de pseudos en parallèle. Le résultat respecte l'ordre d'entrée.
+
+        on_progress(nb_termines, nb_total) est appelé depuis le thread appelant à chaque résultat.
+        Les pseudos présents dans le cache sont servis sans appel réseau, sauf si force=True.
+        par_guilde : les membres d'une guilde dominante sont résolus par l'effectif de la guilde, en deux
+        requêtes ; les autres joueurs sont résolus un par un.
+        on_resultat(i, fiche) reçoit chaque fiche dès qu'elle est connue ; si l'événement `arret` est levé,
+        la résolution s'interrompt et les pseudos non résolus restent à None.
+        """
+        resultats = [None] * len(pseudos)
+        if not pseudos:
+            return resultats
+        en_cache = {} if self.cache is None or force else self.cache.lire(self.serveur, pseudos)
+        nb = 0
+        def terminer(i, fiche):
+            nonlocal nb
+            resultats[i] = fiche
+            nb += 1
+            if on_resultat: on_resultat(i, fiche)
+            if on_progress: on_progress(nb, len(pseudos))
+        a_resoudre = []
+        for i, p in enumerate(pseudos):
+            if p in en_cache:
+                terminer(i, en_cache[p])
+            else:
+                a_resoudre.append(i)
+        if par_guilde and len(a_resoudre) > TAILLE_ECHANTILLON:
+            a_resoudre = self._resoudre_par_guildes(pseudos, a_resoudre, resultats, terminer, arret, force)
+        self._resoudre_un_par_un(pseudos, a_resoudre, terminer, arret, force)
+        return resultats
+
+def get_player_stats(pseudo, client=None):
+    """Raccourci : résout un seul pseudo avec un client (nouveau si non fourni)."""
+    return (client or ClientAlbion()).get_player_stats(pseudo)
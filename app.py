@@ -1,13 +1,24 @@
 import os
 import streamlit as st
-import gspread
 import pandas as pd
-import requests
-import time
-import re
 import json
+import uuid
 from datetime import datetime
-from collections import Counter
+from gspread.exceptions import WorksheetNotFound
+
+from config import NOM_ONGLET_JOURNAL, NOM_ONGLET_REF, FICHIER_COMPTE_SERVICE, DOSSIER_DATA
+from sheets import ouvrir_classeur
+from journal_store import JournalStore, COLONNES_JOURNAL
+from file_ecriture import FileEcriture
+from albion_api import ClientAlbion, REQUETES_PAR_SECONDE, NB_THREADS
+from cache_joueurs import CacheJoueurs, TTL_TROUVE_S, TTL_INCONNU_S, TAILLE_MAX
+from ledger import preparer_journal, IndexAgregats, IndexHistorique, RegistrePlots, TRIS_HISTORIQUE
+from partage import CachePartage
+from archives import JournalReparti
+from scanner import analyser_export
+from scans import GestionnaireScans, EN_COURS, TERMINE, REPRENABLES
+from reference import IndexReference, COLONNES_REFERENCE
+from instrumentation import demarrer_profil, ecrire_profil, configurer_log, instrumenter_session, etape
 
 # --- CONFIGURATION DE LA PAGE ---
 st.set_page_config(page_title="Albion Economy Manager", page_icon="⚔️", layout="wide")
@@ -102,8 +113,11 @@ def check_password():
                 submit = st.form_submit_button("A R I O N", use_container_width=True)
                 
                 if submit:
-                    if pwd == st.secrets.get("app_password", "Albion2024!"): 
+                    mdp_admin = st.secrets.get("admin_password")
+                    if pwd == st.secrets.get("app_password", "Albion2024!") or (mdp_admin and pwd == mdp_admin): 
                         st.session_state["password_correct"] = True
+                        # Le mot de passe admin donne aussi accès au panneau de performances
+                        st.session_state["admin"] = bool(mdp_admin) and pwd == mdp_admin
                         st.rerun()
                     else:
                         st.error("❌ Mot de passe incorrect.")
@@ -113,6 +127,14 @@ def check_password():
 if not check_password():
     st.stop()
 
+# --- INSTRUMENTATION ---
+# Un rerun arrêté par st.rerun() / st.stop() n'atteint pas la fin du script : son profil est écrit ici
+configurer_log(DOSSIER_DATA)
+ecrire_profil(st.session_state.get("profil_perf"), interrompu=True)
+if "id_session_perf" not in st.session_state: st.session_state["id_session_perf"] = uuid.uuid4().hex[:8]
+profil = demarrer_profil(st.session_state["id_session_perf"])
+st.session_state["profil_perf"] = profil
+
 # --- LA SUITE DU CODE NE CHANGE PAS ---
 # --- CONFIGURATION FICHIERS ---
 # ...
@@ -122,9 +144,7 @@ if not check_password():
 # NOM_DU_FICHIER_SHEET = "Arion Plot"
 # etc...
 # --- CONFIGURATION FICHIERS ---
-NOM_DU_FICHIER_SHEET = "Arion Plot"
-NOM_ONGLET_JOURNAL = "Journal_App"
-NOM_ONGLET_REF = "Reference_Craft"
+# Noms du classeur et des onglets : voir config.py (partagés avec la CLI)
 
 # --- FONCTIONS UTILITAIRES ---
 def format_monetaire(valeur):
@@ -135,66 +155,156 @@ def format_nombre_entier(valeur):
     try: return "{:,.0f}".format(float(valeur)).replace(",", " ")
     except: return str(valeur)
 
-def get_typology(name):
-    if name in ["Taxe Guilde", "Autre"]: return "DIVERS"
-    base = re.sub(r'[\d\s]+$', '', str(name)).strip().upper()
-    return base if base else "INCONNU"
-
 # --- API ALBION ---
-def get_player_stats(pseudo):
-    try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        resp = requests.get(f"https://gameinfo-ams.albiononline.com/api/gameinfo/search?q={pseudo}", headers=headers)
-        if resp.status_code == 200:
-            data = resp.json()
-            candidats = [p for p in data.get('players', []) if p['Name'].lower() == pseudo.lower()]
-            if not candidats: return {"Pseudo": pseudo, "Trouve": False}
-            meilleur_fame = -1
-            infos_meilleur = {}
-            for p in candidats[:3]:
-                try:
-                    r_det = requests.get(f"https://gameinfo-ams.albiononline.com/api/gameinfo/players/{p['Id']}", headers=headers)
-                    if r_det.status_code == 200:
-                        d = r_det.json()
-                        val_fame = d.get('LifetimeStatistics', {}).get('Crafting', {}).get('Total') or d.get('CraftFame') or 0
-                        if val_fame > meilleur_fame: 
-                            meilleur_fame = val_fame
-                            infos_meilleur = d
-                    time.sleep(0.05)
-                except: pass
-            if infos_meilleur:
-                return {
-                    "Pseudo": infos_meilleur.get('Name'), 
-                    "Guilde": infos_meilleur.get('GuildName') or "Aucune",
-                    "Alliance": infos_meilleur.get('AllianceName') or "-", 
-                    "Craft Fame": meilleur_fame, 
-                    "Trouve": True
-                }
-        return {"Pseudo": pseudo, "Trouve": False}
-    except: return {"Pseudo": pseudo, "Trouve": False}
+@st.cache_resource
+def get_client_albion():
+    """Client gameinfo partagé par tout le processus : une seule limite de débit pour toutes les sessions."""
+    client = ClientAlbion(
+        requetes_par_seconde=float(st.secrets.get("albion_api_rps", REQUETES_PAR_SECONDE)),
+        nb_threads=int(st.secrets.get("albion_api_threads", NB_THREADS)),
+        cache=CacheJoueurs(
+            ttl=float(st.secrets.get("cache_joueurs_ttl_s", TTL_TROUVE_S)),
+            ttl_inconnu=float(st.secrets.get("cache_joueurs_ttl_inconnu_s", TTL_INCONNU_S)),
+            taille_max=int(st.secrets.get("cache_joueurs_taille_max", TAILLE_MAX)),
+        ),
+    )
+    instrumenter_session(client.session, "http")
+    return client
 
 # --- CONNEXION GOOGLE SHEETS ---
-try:
-    if os.path.exists('service_account.json'):
-        gc = gspread.service_account(filename='service_account.json')
-    else:
-        gc = gspread.service_account_from_dict(json.loads(st.secrets["gcp_service_account"].strip()))
-        
-    sh = gc.open(NOM_DU_FICHIER_SHEET)
+@st.cache_resource
+def connexion_sheets():
+    """Ouvre le classeur une seule fois pour tout le processus (partagé entre reruns et sessions)."""
+    infos_compte = None if os.path.exists(FICHIER_COMPTE_SERVICE) else json.loads(st.secrets["gcp_service_account"].strip())
+    sh = ouvrir_classeur(infos_compte)
+    instrumenter_session(sh.client.session, "sheets")  # sh.client : HTTPClient gspread
+    return sh
+
+@st.cache_resource
+def onglets_sheets():
+    """Onglets journal et référence, résolus une seule fois : chaque sh.worksheet() relit les métadonnées du classeur."""
+    sh = connexion_sheets()
     worksheet = sh.worksheet(NOM_ONGLET_JOURNAL)
     try: ws_ref = sh.worksheet(NOM_ONGLET_REF)
-    except: ws_ref = None
-except Exception as e: 
-    st.error(f"❌ Erreur connexion Google Sheets : {e}")
-    st.stop()
+    except WorksheetNotFound: ws_ref = None
+    return worksheet, ws_ref
+
+@st.cache_resource
+def get_journal_store():
+    """Miroir local du journal, partagé entre reruns et sessions."""
+    return JournalStore(NOM_ONGLET_JOURNAL)
+
+@st.cache_resource
+def get_file_ecriture():
+    """File d'écriture durable vers le journal, vidée par lots en arrière-plan."""
+    return FileEcriture(get_journal_store())
+
+@st.cache_resource
+def get_gestionnaire_scans():
+    """Scans en tâche de fond, partagés par le processus et persistés (reprise après rechargement)."""
+    return GestionnaireScans(get_client_albion())
+
+@st.cache_resource
+def get_index_reference():
+    """Index des crafteurs de référence, relu seulement à expiration ou après une sauvegarde."""
+    return IndexReference()
+
+@st.cache_resource
+def get_index_agregats():
+    """Agrégats quotidiens du journal, mis à jour incrémentalement à chaque nouvelle ligne."""
+    return IndexAgregats()
+
+@st.cache_resource
+def get_registre_plots():
+    """Registre des plots (ouverture, clôture, net, famille), mis à jour à chaque nouvelle ligne du journal."""
+    return RegistrePlots()
+
+@st.cache_resource
+def get_journal_reparti():
+    """Onglets d'archive du journal (un miroir et un index par onglet), chargés seulement pour les périodes demandées."""
+    return JournalReparti(get_journal_store())
+
+@st.cache_resource
+def get_calculs_partages():
+    """Journal préparé et index d'historique, calculés une fois par version et partagés par toutes les sessions."""
+    return CachePartage("calculs_partages")
+
+def construire_index_historique(df_historique, cle):
+    index = IndexHistorique()
+    index.synchroniser(df_historique, cle)
+    return index
 
 # --- ANALYSE DES PLOTS ---
-data_journal = worksheet.get_all_records()
-df_journal = pd.DataFrame(data_journal) if data_journal else pd.DataFrame(columns=['Date', 'Plot', 'Type', 'Montant', 'Note'])
-
-tous_les_plots = [p for p in df_journal['Plot'].unique() if str(p).strip() not in ["", "Taxe Guilde", "Autre"]]
-plots_clotures = df_journal[(df_journal['Type'] == 'Clôture') | (df_journal['Note'] == 'Clôture')]['Plot'].unique().tolist()
-plots_actifs = [p for p in tous_les_plots if p not in plots_clotures]
+# Le journal est lu depuis le miroir local ; seules les nouvelles lignes sont téléchargées
+journal_store = get_journal_store()
+sh = worksheet = ws_ref = None
+try:
+    with etape("connexion_sheets"):
+        sh = connexion_sheets()
+        worksheet, ws_ref = onglets_sheets()
+except Exception as e:
+    # Sans connexion, le miroir local suffit à l'affichage ; les saisies attendent dans la file d'écriture
+    if journal_store.nb_lignes == 0:
+        st.error(f"❌ Erreur connexion Google Sheets : {e}")
+        st.stop()
+    st.warning(f"⚠️ Google Sheets injoignable, affichage de la copie locale : {e}")
+if worksheet is not None:
+    try:
+        with etape("sync_journal"):
+            journal_store.synchroniser(worksheet)
+    except Exception as e:
+        if journal_store.nb_lignes == 0:
+            st.error(f"❌ Erreur lecture du journal : {e}")
+            st.stop()
+        st.warning(f"⚠️ Synchronisation impossible, affichage de la copie locale : {e}")
+file_ecriture = get_file_ecriture()
+if worksheet is not None:
+    file_ecriture.demarrer(worksheet)
+journal_reparti = get_journal_reparti()
+if sh is not None:
+    try:
+        with etape("catalogue_archives"):
+            journal_reparti.rafraichir_catalogue(sh)
+    except Exception as e:
+        st.warning(f"⚠️ Liste des archives indisponible, copie locale utilisée : {e}")
+
+# Les saisies pas encore envoyées à Google Sheets sont visibles immédiatement
+with etape("chargement_journal"):
+    nb_lignes_avant = journal_store.nb_lignes
+    lignes_en_attente = pd.DataFrame(file_ecriture.en_attente(), columns=COLONNES_JOURNAL)
+with etape("index_agregats"):
+    index_agregats = get_index_agregats()
+    index_agregats.synchroniser(journal_store)
+with etape("registre_plots"):
+    registre_plots = get_registre_plots()
+    registre_plots.synchroniser(journal_store)
+    # Un lot envoyé entre les deux synchronisations : les deux index doivent s'arrêter à la même ligne
+    for _ in range(3):
+        if index_agregats.nb_lignes == registre_plots.nb_lignes:
+            break
+        index_agregats.synchroniser(journal_store)
+        registre_plots.synchroniser(journal_store)
+with etape("chargement_journal"):
+    # Frontière commune : les lignes ingérées par les index. Une saisie en attente déjà présente en deçà est
+    # retirée de la file affichée ; au-delà, elle reste comptée comme en attente (et pas dans le journal)
+    nb_lignes_index = min(index_agregats.nb_lignes, registre_plots.nb_lignes)
+    brut_journal, nb_lignes_journal, checksum_journal = journal_store.instantane()
+    brut_journal = brut_journal.iloc[:nb_lignes_index]
+    if not lignes_en_attente.empty and nb_lignes_index > nb_lignes_avant:
+        deja_synchronisees = brut_journal['Cle'].iloc[nb_lignes_avant:]
+        lignes_en_attente = lignes_en_attente[~lignes_en_attente['Cle'].isin(deja_synchronisees)].reset_index(drop=True)
+    df_en_attente = preparer_journal(lignes_en_attente)
+    # Journal préparé partagé (lecture seule) : N sessions sur le même instantané ne le calculent qu'une fois
+    calculs_partages = get_calculs_partages()
+    cle_journal = (nb_lignes_journal, checksum_journal, nb_lignes_index, tuple(lignes_en_attente['Cle']))
+    df_journal = calculs_partages.obtenir(("journal",) + cle_journal, lambda: preparer_journal(
+        pd.concat([brut_journal, lignes_en_attente], ignore_index=True) if not lignes_en_attente.empty else brut_journal
+    ))
+
+with etape("registre_plots"):
+    fiches_plots = registre_plots.fiches(en_attente=df_en_attente)
+    tous_les_plots = [p for p, fiche in fiches_plots.items() if fiche["Suivi"]]
+    plots_actifs = [p for p in tous_les_plots if not fiches_plots[p]["Clos"]]
 
 if not plots_actifs:
     plots_actifs = ["Premier Plot"]
@@ -222,24 +332,29 @@ with tab1:
                     st.warning("Veuillez sélectionner une cible valide.")
                 else:
                     try:
-                        worksheet.append_row([datetime.now().strftime("%d/%m/%Y"), nom_plot, type_op, montant, note])
-                        st.success(f"✅ Transaction enregistrée pour {nom_plot} !")
-                        time.sleep(1) 
+                        file_ecriture.ajouter([datetime.now().strftime("%d/%m/%Y"), nom_plot, type_op, montant, note])
+                        st.toast(f"Transaction enregistrée pour {nom_plot} !", icon="✅")
                         st.rerun() 
                     except Exception as e:
                         st.error(f"Erreur d'écriture: {e}")
 
+        etat_file = file_ecriture.etat()
+        if etat_file["attente"]:
+            st.caption(f"⏳ {etat_file['attente']} ligne(s) en attente d'envoi vers Google Sheets")
+        if etat_file["echec"]:
+            st.error(f"❌ {etat_file['echec']} ligne(s) non envoyée(s) : {etat_file['erreur']}")
+            st.button("Réessayer l'envoi", on_click=file_ecriture.relancer_echecs)
+
     with col_gestion:
         st.markdown("<h3 class='albion-font'>Gestion du Parc 🏗️</h3>", unsafe_allow_html=True)
         with st.expander("🟢 Acheter / Ouvrir un nouveau plot", expanded=False):
             nouveau_nom = st.text_input("Nom du plot (ex: Fibre Mars)")
             cout_initial = st.number_input("Coût d'achat initial (Silver)", step=1000000, format="%d", min_value=0)
             if st.button("Ouvrir ce plot", use_container_width=True):
-                if nouveau_nom and nouveau_nom not in tous_les_plots:
+                if nouveau_nom and nouveau_nom not in fiches_plots:
                     try:
-                        worksheet.append_row([datetime.now().strftime("%d/%m/%Y"), nouveau_nom, "Dépense (-)", cout_initial, "Ouverture"])
-                        st.success(f"Plot '{nouveau_nom}' créé !")
-                        time.sleep(1)
+                        file_ecriture.ajouter([datetime.now().strftime("%d/%m/%Y"), nouveau_nom, "Dépense (-)", cout_initial, "Ouverture"])
+                        st.toast(f"Plot '{nouveau_nom}' créé !", icon="✅")
                         st.rerun()
                     except Exception as e:
                         st.error(f"Erreur: {e}")
@@ -252,9 +367,8 @@ with tab1:
             if st.button("Confirmer la clôture", use_container_width=True):
                 if plot_a_fermer:
                     try:
-                        worksheet.append_row([datetime.now().strftime("%d/%m/%Y"), plot_a_fermer, "Recette (+)", prix_revente, "Clôture"])
-                        st.success(f"Le plot '{plot_a_fermer}' a été vendu/archivé !")
-                        time.sleep(1)
+                        file_ecriture.ajouter([datetime.now().strftime("%d/%m/%Y"), plot_a_fermer, "Recette (+)", prix_revente, "Clôture"])
+                        st.toast(f"Le plot '{plot_a_fermer}' a été vendu/archivé !", icon="✅")
                         st.rerun()
                     except Exception as e:
                         st.error(f"Erreur: {e}")
@@ -263,21 +377,12 @@ with tab1:
 with tab2:
     st.markdown("<h3 class='albion-font'>État des Finances</h3>", unsafe_allow_html=True)
     if not df_journal.empty:
-        def calc_reel(row):
-            t = str(row['Type']).lower()
-            m = float(row.get('Montant', 0))
-            if "dépense" in t: return -m
-            elif "recette" in t: return m
-            return 0
-            
-        df_journal['Reel'] = df_journal.apply(calc_reel, axis=1)
-        df_journal['Date_Obj'] = pd.to_datetime(df_journal['Date'], format='%d/%m/%Y', errors='coerce')
-        df_journal['Date_Obj'] = df_journal['Date_Obj'].fillna(pd.to_datetime(df_journal['Date'].astype(str) + f"/{datetime.now().year}", format='%d/%m/%Y', errors='coerce'))
-
-        min_date_globale = df_journal['Date_Obj'].min().date()
+        # Par défaut, seule la période de l'onglet actif est affichée ; "Afficher le Total" inclut les archives
+        min_date_actif = df_journal['Date_Obj'].min().date()
+        min_date_globale = min(min_date_actif, journal_reparti.debut() or min_date_actif)
         max_date_globale = max(df_journal['Date_Obj'].max().date(), datetime.today().date())
 
-        if 'date_debut' not in st.session_state: st.session_state['date_debut'] = min_date_globale
+        if 'date_debut' not in st.session_state: st.session_state['date_debut'] = min_date_actif
         if 'date_fin' not in st.session_state: st.session_state['date_fin'] = max_date_globale
 
         def reset_dates_totales(d_min, d_max):
@@ -294,13 +399,23 @@ with tab2:
             st.button("🔄 Afficher le Total", on_click=reset_dates_totales, args=(min_date_globale, max_date_globale), use_container_width=True)
         st.markdown("</div>", unsafe_allow_html=True)
 
-        mask = (df_journal['Date_Obj'].dt.date >= date_debut) & (df_journal['Date_Obj'].dt.date <= date_fin)
-        df_filtre = df_journal.loc[mask]
-
-        # On calcule les totaux globaux de la période filtrée
-        total = df_filtre['Reel'].sum() if not df_filtre.empty else 0
-        total_recettes = df_filtre[df_filtre['Reel'] > 0]['Reel'].sum() if not df_filtre.empty else 0
-        total_depenses = df_filtre[df_filtre['Reel'] < 0]['Reel'].sum() if not df_filtre.empty else 0
+        # Archives recoupant la période : chargées en parallèle, puis lues dans leurs propres index
+        try:
+            with etape("archives"):
+                archives_periode = journal_reparti.charger(date_debut, date_fin, sh)
+        except Exception as e:
+            st.error(f"❌ Lecture des archives impossible, totaux incomplets : {e}")
+            archives_periode = []
+        # Les archives chargées complètent les ouvertures / clôtures du registre
+        for nom in archives_periode:
+            registre_plots.integrer_archive(nom, journal_reparti.store(nom))
+
+        # Totaux de la période lus dans l'index d'agrégats (sommes cumulées par jour)
+        with etape("totaux_periode"):
+            totaux_periode = journal_reparti.totaux(date_debut, date_fin, index_agregats, en_attente=df_en_attente)
+        total = totaux_periode["total"]
+        total_recettes = totaux_periode["recettes"]
+        total_depenses = totaux_periode["depenses"]
 
         css_class = "val-pos" if total >= 0 else "val-neg"
         st.markdown(f"""
@@ -319,26 +434,9 @@ with tab2:
         # --- PLOTS CONSOLIDÉS PAR FAMILLE (ACTIFS ET CLÔTURÉS INCLUS) ---
         st.markdown(f"<h4 class='albion-font'>🟢 Bilan Consolidé par Famille</h4>", unsafe_allow_html=True)
         
-        # On détermine TOUTES les familles depuis l'ensemble des plots (actifs ET clôturés)
-        toutes_familles = set([get_typology(p) for p in tous_les_plots])
-        totaux_familles = {fam: 0 for fam in toutes_familles}
-        totaux_familles["DIVERS"] = 0 
-        
-        # On ajoute les calculs basés sur la période filtrée
-        if not df_filtre.empty:
-            df_filtre_family = df_filtre.copy()
-            df_filtre_family['Famille'] = df_filtre_family['Plot'].apply(get_typology)
-            
-            # ICI : on autorise TOUS les plots pour que les clôturés remontent dans leur famille respective
-            plots_autorises = tous_les_plots + ["Taxe Guilde", "Autre"]
-            df_filtre_tous = df_filtre_family[df_filtre_family['Plot'].isin(plots_autorises)]
-            
-            stats_familles = df_filtre_tous.groupby('Famille')['Reel'].sum()
-            for fam, val in stats_familles.items():
-                if fam in totaux_familles:
-                    totaux_familles[fam] += val
-                else:
-                    totaux_familles[fam] = val
+        # TOUTES les familles (plots actifs ET clôturés) sont présentes, les clôturés remontent dans leur famille
+        with etape("familles"):
+            totaux_familles = journal_reparti.bilan_familles(date_debut, date_fin, tous_les_plots, index_agregats, en_attente=df_en_attente)
         
         # Affichage : on trie par nom
         cols_fam = st.columns(3)
@@ -357,11 +455,90 @@ with tab2:
                     """, unsafe_allow_html=True)
                 idx += 1
 
+        # --- RENTABILITÉ PAR PLOT (DURÉE DE VIE COMPLÈTE) ---
+        with st.expander("📈 Rentabilité par Plot", expanded=False):
+            with etape("rentabilite"):
+                fiches_plots = registre_plots.fiches(en_attente=df_en_attente)
+                aujourd_hui = datetime.today().date()
+                lignes_roi = []
+                for p in tous_les_plots:
+                    fiche = fiches_plots[p]
+                    debut_vie = fiche["Ouverture"] or fiche["Premiere"]
+                    duree = ((fiche["Cloture"] or aujourd_hui) - debut_vie).days + 1 if debut_vie else None
+                    lignes_roi.append({
+                        "Plot": p, "Famille": fiche["Famille"], "Statut": "🔴 Clôturé" if fiche["Clos"] else "🟢 Actif",
+                        "Ouverture": fiche["Ouverture"], "Coût": fiche["Cout"], "Clôture": fiche["Cloture"], "Revente": fiche["Revente"],
+                        "Net": fiche["Net"], "ROI": fiche["Net"] / fiche["Cout"] if fiche["Cout"] else None,
+                        "Durée (j)": duree, "Net / jour": fiche["Net"] / duree if duree else None,
+                    })
+            st.dataframe(
+                pd.DataFrame(lignes_roi), use_container_width=True, hide_index=True,
+                column_config={
+                    "Coût": st.column_config.NumberColumn(format="%d 💰"), "Revente": st.column_config.NumberColumn(format="%d 💰"),
+                    "Net": st.column_config.NumberColumn(format="%d 💰"), "ROI": st.column_config.NumberColumn(format="percent"),
+                    "Net / jour": st.column_config.NumberColumn(format="%d 💰"),
+                },
+            )
+            if any(fiches_plots[p]["Ouverture"] is None for p in tous_les_plots) and journal_reparti.archives:
+                st.caption("Certaines ouvertures sont archivées : « Afficher le Total » les charge.")
+
         st.divider()
         st.markdown("<h4 class='albion-font'>Historique Détaillé</h4>", unsafe_allow_html=True)
-        if not df_filtre.empty:
-            df_display = df_filtre.sort_values(by='Date_Obj', ascending=False).copy()
-            st.dataframe(df_display[['Date', 'Plot', 'Type', 'Montant', 'Note']], use_container_width=True, column_config={"Montant": st.column_config.NumberColumn(format="%d 💰")})
+        # Pagination côté serveur : seule la page visible est envoyée au navigateur
+        with etape("historique_index"):
+            stores_archives = [journal_reparti.store(nom) for nom in archives_periode]
+            cle_historique = cle_journal + (tuple((s.onglet, s.version) for s in stores_archives),)
+            # Un index par combinaison d'archives : deux sessions sur des périodes différentes ne s'évincent pas
+            index_historique = calculs_partages.obtenir(("historique",) + cle_historique, lambda: construire_index_historique(
+                preparer_journal(pd.concat(
+                    [brut_journal, lignes_en_attente] + [s.charger() for s in stores_archives], ignore_index=True
+                )) if stores_archives else df_journal,
+                cle_historique,
+            ))
+        col_f1, col_f2, col_f3 = st.columns(3)
+        with col_f1: filtre_plots = st.multiselect("Plot", df_journal['Plot'].cat.categories.tolist(), key="historique_plots")
+        with col_f2: filtre_familles = st.multiselect("Famille", df_journal['Famille'].cat.categories.tolist(), key="historique_familles")
+        with col_f3: filtre_types = st.multiselect("Type", df_journal['Type'].cat.categories.tolist(), key="historique_types")
+        col_tri, col_ordre, col_taille = st.columns([2, 1, 1])
+        with col_tri: tri = st.radio("Trier par", TRIS_HISTORIQUE, horizontal=True, key="historique_tri")
+        with col_ordre: descendant = st.toggle("Décroissant", value=True, key="historique_desc")
+        with col_taille: taille_page = st.selectbox("Lignes / page", [25, 50, 100, 200], index=1, key="historique_taille")
+
+        with etape("historique_selection"):
+            positions = index_historique.selectionner(date_debut, date_fin, tri, descendant, filtre_plots, filtre_familles, filtre_types)
+        nb_pages = max(1, -(-len(positions) // taille_page))
+        if st.session_state.get("historique_page", 1) > nb_pages: st.session_state["historique_page"] = nb_pages
+        if len(positions):
+            with etape("historique_rendu"):
+                page = st.number_input(f"Page (sur {nb_pages})", min_value=1, max_value=nb_pages, step=1, key="historique_page")
+                debut_page = (page - 1) * taille_page
+                st.dataframe(
+                    index_historique.lignes(positions[debut_page:debut_page + taille_page], ['Date', 'Plot', 'Type', 'Montant', 'Note']),
+                    use_container_width=True, column_config={"Montant": st.column_config.NumberColumn(format="%d 💰")}
+                )
+                st.caption(f"Lignes {debut_page + 1} à {min(debut_page + taille_page, len(positions))} sur {len(positions)}")
+        else:
+            st.caption("Aucune transaction pour ces critères.")
+
+        # --- ARCHIVAGE (ADMIN) ---
+        if st.session_state.get("admin"):
+            with st.expander("🗄️ Archiver le journal", expanded=False):
+                st.caption("Déplace des lignes vers des onglets d'archive par année ou trimestre ; une ligne de résumé par plot reste dans le journal. Les totaux sont inchangés.")
+                mode_archive = st.radio("Lignes à archiver", ["clotures", "periode"], horizontal=True,
+                                        format_func=lambda m: {"clotures": "Plots clôturés", "periode": "Périodes passées"}[m])
+                granularite = st.radio("Un onglet par", ["annee", "trimestre"], horizontal=True,
+                                       format_func=lambda g: {"annee": "Année", "trimestre": "Trimestre"}[g])
+                avant = st.date_input("Archiver les lignes antérieures au", value=datetime(datetime.today().year, 1, 1).date(),
+                                      disabled=mode_archive != "periode")
+                if st.button("Archiver", use_container_width=True, disabled=sh is None,
+                             help="Indisponible hors connexion." if sh is None else None):
+                    try:
+                        with st.spinner("Archivage en cours..."):
+                            bilan_archive = journal_reparti.archiver(sh, worksheet, mode_archive, granularite, avant)
+                        st.toast(f"{bilan_archive['lignes']} ligne(s) archivée(s) dans {len(bilan_archive['onglets'])} onglet(s).", icon="🗄️")
+                        st.rerun()
+                    except Exception as e:
+                        st.error(f"Erreur d'archivage : {e}")
 
 # --- TAB 3 : ARION SCANNER ---
 with tab3:
@@ -370,52 +547,104 @@ with tab3:
     with col_input:
         if 'json_input' not in st.session_state: st.session_state['json_input'] = ""
         raw_text = st.text_area("Permissions JSON/Texte", value=st.session_state['json_input'], height=200, help="Collez ici l'export de votre plot.")
+        fichier_export = st.file_uploader("... ou importez le fichier d'export", type=["json", "txt"], help="Recommandé pour les gros exports (plusieurs plots).")
     with col_action:
         st.write("### Actions")
         scan_btn = st.button("Lancer l'Analyse", type="primary", use_container_width=True)
         st.write("")
         save_ref_btn = st.button("Sauvegarder la référence", use_container_width=True)
+        force_refresh = st.checkbox("Forcer l'actualisation", help="Ignore le cache joueurs et réinterroge l'API Albion.")
+
+    # Le scan tourne en tâche de fond : son identifiant (aussi dans l'URL) permet de le retrouver après un rechargement
+    gestionnaire_scans = get_gestionnaire_scans()
+    if 'scan_id' not in st.session_state: st.session_state['scan_id'] = st.query_params.get("scan")
+
+    def ouvrir_scan(id_scan):
+        st.session_state['scan_id'] = id_scan
+        if id_scan: st.query_params["scan"] = id_scan
+        elif "scan" in st.query_params: del st.query_params["scan"]
+
+    index_reference = get_index_reference()
+    if ws_ref:
+        try:
+            with etape("scan_reference"): index_reference.charger(ws_ref)
+        except: pass
+
+    if scan_btn and (raw_text or fichier_export):
+        # Lecture en flux : le fichier importé est parcouru par blocs, sans être chargé en entier
+        with etape("scan_export"):
+            export = analyser_export(fichier_export if fichier_export is not None else raw_text)
+        if not export.joueurs:
+            st.warning("Aucun joueur trouvé.")
+        else:
+            ouvrir_scan(gestionnaire_scans.lancer(export, force=force_refresh))
+
+    scans_recents = [e for e in gestionnaire_scans.recents() if e]
+    if scans_recents:
+        libelles = {e["id"]: f"{datetime.fromtimestamp(e['cree']).strftime('%d/%m %H:%M')} — {e['nb_faits']}/{e['nb_total']} joueurs ({e['statut']})" for e in scans_recents}
+        ids_recents = list(libelles)
+        id_courant = st.session_state['scan_id']
+        choix = st.selectbox("🗂️ Scans récents", ids_recents, index=ids_recents.index(id_courant) if id_courant in libelles else None,
+                             format_func=libelles.get, placeholder="Rouvrir un scan...")
+        if choix and choix != id_courant:
+            ouvrir_scan(choix)
+
+    id_scan = st.session_state['scan_id']
+    etat_scan = gestionnaire_scans.etat(id_scan) if id_scan else None
+    if id_scan and etat_scan is None:
+        ouvrir_scan(None)
+
+    if save_ref_btn:
+        # Un scan partiel (en cours, annulé, interrompu) marquerait « Parti » tout membre pas encore résolu
+        if etat_scan is None or etat_scan["statut"] != TERMINE:
+            st.warning("Attendez la fin d'une analyse : la référence est construite à partir du dernier scan complet.")
+        elif sh is None:
+            st.warning("Google Sheets injoignable : la référence ne peut pas être sauvegardée.")
+        else:
+            try:
+                if ws_ref is None:
+                    ws_ref = sh.add_worksheet(NOM_ONGLET_REF, rows=1000, cols=len(COLONNES_REFERENCE))
+                    onglets_sheets.clear()
+                bilan = index_reference.sauvegarder(ws_ref, gestionnaire_scans.resultats(id_scan))
+                st.success(f"📌 Référence mise à jour : {bilan['ajoutes']} ajout(s), {bilan['reactives']} retour(s), {bilan['partis']} départ(s).")
+            except Exception as e:
+                st.error(f"Erreur de sauvegarde de la référence : {e}")
+
+    def afficher_scan(id_scan):
+        """Avancement et résultats (partiels) du scan ; rafraîchi périodiquement tant qu'il tourne."""
+        etat_scan = gestionnaire_scans.etat(id_scan)
+        if etat_scan is None:
+            return
+        if etat_scan["statut"] != EN_COURS and st.session_state.get("scan_suivi") == id_scan:
+            # Fin du scan : rerun complet pour arrêter le rafraîchissement automatique
+            st.session_state["scan_suivi"] = None
+            st.toast("Scan terminé !", icon="✅")
+            st.rerun()
+        if etat_scan["guildes"] or etat_scan["alliances"]:
+            st.caption(f"🛡️ {etat_scan['guildes']} guilde(s) et ⚔️ {etat_scan['alliances']} alliance(s) autorisée(s) dans l'export.")
+        if etat_scan["statut"] == EN_COURS:
+            col_barre, col_stop = st.columns([4, 1])
+            with col_barre: st.progress(etat_scan["nb_faits"] / max(etat_scan["nb_total"], 1), text=f"Consultation des archives... {etat_scan['nb_faits']}/{etat_scan['nb_total']}")
+            with col_stop: st.button("⏹️ Annuler", on_click=gestionnaire_scans.annuler, args=(id_scan,), use_container_width=True)
+        elif etat_scan["statut"] in REPRENABLES:
+            col_info, col_reprise = st.columns([4, 1])
+            with col_info:
+                message = f"Scan incomplet ({etat_scan['statut']}) : {etat_scan['nb_faits']}/{etat_scan['nb_total']} joueurs résolus."
+                st.warning(message + (f" {etat_scan['erreur']}" if etat_scan['erreur'] else ""))
+            with col_reprise:
+                if st.button("▶️ Reprendre", use_container_width=True):
+                    gestionnaire_scans.reprendre(id_scan)
+                    st.session_state["scan_suivi"] = id_scan
+                    st.rerun()
+
+        fiches = gestionnaire_scans.resultats(id_scan)
+        if not fiches:
+            return
+        df_res = pd.DataFrame(fiches)
+        df_res['Statut'] = ["✅ Connu" if index_reference.est_connu(str(p).lower()) else "🆕 Nouveau" for p in df_res['Pseudo']]
 
-    if 'data_display' not in st.session_state: st.session_state['data_display'] = None
-
-    if scan_btn and raw_text:
-        with st.spinner("Consultation des archives et comptage des membres..."):
-            raw_players_all = re.findall(r'"Player:([^"]+)"', raw_text)
-            counts = Counter([p.lower() for p in raw_players_all])
-            raw_players = list(set(raw_players_all))
-            
-            ref_players = []
-            if ws_ref:
-                try:
-                    ref_data = ws_ref.get_all_records()
-                    ref_players = [str(r.get('Pseudo', '')).lower() for r in ref_data]
-                except: pass
-
-            if not raw_players: 
-                st.warning("Aucun joueur trouvé.")
-            else:
-                resultats = []
-                barre = st.progress(0)
-                for i, p_name in enumerate(raw_players):
-                    infos = get_player_stats(p_name)
-                    p_lower = str(infos.get('Pseudo', p_name)).lower()
-                    
-                    infos['Occurrences'] = counts.get(p_lower, 1)
-                    infos['Statut'] = "✅ Connu" if p_lower in ref_players else "🆕 Nouveau"
-                    
-                    resultats.append(infos)
-                    barre.progress((i+1)/len(raw_players))
-                    time.sleep(0.05)
-                    
-                barre.empty()
-                st.toast("Scan terminé !", icon="✅")
-                st.session_state['data_display'] = pd.DataFrame(resultats)
-
-    if st.session_state['data_display'] is not None:
-        df_res = st.session_state['data_display']
-        
         # --- BOUTON D'ALERTE DOUBLON ---
-        top_guilds = df_res[df_res['Guilde'] != 'Aucune']['Guilde'].value_counts()
+        top_guilds = df_res[df_res['Guilde'] != 'Aucune']['Guilde'].value_counts() if 'Guilde' in df_res else pd.Series(dtype=int)
         if not top_guilds.empty:
             guilde_cible = top_guilds.index[0]
             nb_joueurs = top_guilds.iloc[0]
@@ -438,6 +667,31 @@ with tab3:
             }
         )
 
-
-
+    if etat_scan is not None:
+        if etat_scan["statut"] == EN_COURS:
+            st.session_state["scan_suivi"] = id_scan
+        # Seul ce fragment est réexécuté pendant le scan : les autres onglets restent utilisables
+        st.fragment(run_every=1.0 if etat_scan["statut"] == EN_COURS else None)(afficher_scan)(id_scan)
+
+# --- PANNEAU DE PERFORMANCES (ADMIN) ---
+if st.session_state.get("admin"):
+    resume_perf = profil.resume()
+    with st.sidebar.expander("⏱️ Performances du rerun", expanded=False):
+        st.metric("Durée du script", f"{resume_perf['total_ms']:.0f} ms")
+        st.dataframe(
+            pd.DataFrame(sorted(resume_perf["etapes_ms"].items(), key=lambda e: -e[1]), columns=["Étape", "ms"]),
+            use_container_width=True, hide_index=True,
+        )
+        st.caption(f"📗 Sheets : {resume_perf['sheets']['lectures']} lecture(s), {resume_perf['sheets']['ecritures']} écriture(s)"
+                   + (f", {resume_perf['sheets']['moy_ms']:.0f} ms en moyenne" if resume_perf['sheets']['nb'] else ""))
+        st.caption(f"🌐 API Albion : {resume_perf['http']['nb']} requête(s) {resume_perf['http']['statuts'] or ''}"
+                   + (f", {resume_perf['http']['moy_ms']:.0f} ms en moyenne" if resume_perf['http']['nb'] else ""))
+        for nom_cache, c in resume_perf["caches"].items():
+            st.caption(f"🗃️ Cache {nom_cache} : {c['hits']} hit(s) / {c['misses']} miss" + (f" ({c['taux']:.0%})" if c['taux'] is not None else ""))
+        # Le scan tourne en tâche de fond avec son propre profil : ses requêtes n'apparaissent pas dans celui du rerun
+        mesures_scan = get_gestionnaire_scans().mesures(st.session_state['scan_id']) if st.session_state.get('scan_id') else None
+        if mesures_scan is not None:
+            st.caption(f"🔮 Scan : {mesures_scan['http']['nb']} requête(s) API Albion {mesures_scan['http']['statuts'] or ''}"
+                       + (f", {mesures_scan['http']['moy_ms']:.0f} ms en moyenne" if mesures_scan['http']['nb'] else ""))
+ecrire_profil(profil)
 
@@ -0,0 +1,257 @@
+import re
+import json
+import time
+import hashlib
+import threading
+import contextvars
+from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from config import DOSSIER_DATA, PREFIXE_ARCHIVE
+from journal_store import JournalStore
+from ledger import preparer_journal, IndexAgregats, TYPE_RESUME
+
+# --- ARCHIVES DU JOURNAL ---
+GRANULARITES = ("annee", "trimestre")
+MOTIF_ARCHIVE = re.compile(re.escape(PREFIXE_ARCHIVE) + r"(\d{4})(?:_T([1-4]))?$")
+INTERVALLE_SYNC_ARCHIVE_S = 3600          # Les archives ne changent qu'à l'archivage
+INTERVALLE_COMPLET_ARCHIVE_S = 24 * 3600
+DUREE_CATALOGUE_S = 600
+NB_THREADS_ARCHIVES = 4
+
+
+def nom_archive(jour, granularite="annee"):
+    """Onglet d'archive d'une date : Archive_2024 (année) ou Archive_2024_T3 (trimestre)."""
+    if granularite == "trimestre":
+        return f"{PREFIXE_ARCHIVE}{jour.year}_T{(jour.month - 1) // 3 + 1}"
+    return f"{PREFIXE_ARCHIVE}{jour.year}"
+
+
+def periode_archive(nom):
+    """(premier jour, dernier jour) couverts par un onglet d'archive, ou None si ce n'en est pas un."""
+    m = MOTIF_ARCHIVE.match(nom)
+    if not m:
+        return None
+    annee = int(m.group(1))
+    if m.group(2) is None:
+        return date(annee, 1, 1), date(annee, 12, 31)
+    t = int(m.group(2))
+    fin = date(annee + 1, 1, 1) if t == 4 else date(annee, 3 * t + 1, 1)
+    return date(annee, 3 * t - 2, 1), date.fromordinal(fin.toordinal() - 1)
+
+
+def _cle_ligne(idx, ligne):
+    """Clé stable d'une ligne sans clé d'idempotence (saisie antérieure à la file d'écriture)."""
+    return "arch-" + hashlib.sha1(f"{idx}|{json.dumps(ligne, ensure_ascii=False)}".encode("utf-8")).hexdigest()[:16]
+
+
+class JournalReparti:
+    """Journal réparti entre l'onglet actif et des onglets d'archive par année ou par trimestre.
+
+    Chaque onglet a son propre JournalStore (même fichier SQLite) et son propre IndexAgregats. Une requête
+    ne charge que les archives dont la période recoupe l'intervalle demandé, en parallèle ; l'onglet actif
+    reste le seul lu à chaque rerun. L'archivage laisse dans l'onglet actif une ligne TYPE_RESUME par plot
+    et par archive, qui garde le plot connu de l'application sans compter dans les totaux.
+    """
+
+    def __init__(self, actif, dossier=DOSSIER_DATA, nb_threads=NB_THREADS_ARCHIVES):
+        self.actif = actif
+        self.dossier = dossier
+        self.nb_threads = nb_threads
+        self._verrou = threading.RLock()
+        self._stores = {}
+        self._index = {}
+        self._worksheets = {}
+        self._catalogue_le = 0.0
+        # Les archives déjà présentes dans le miroir restent utilisables hors ligne
+        for nom in actif.onglets_locaux():
+            self._declarer(nom)
+
+    # --- CATALOGUE ---
+    def _declarer(self, nom):
+        if periode_archive(nom) is None or nom in self._stores:
+            return
+        self._stores[nom] = JournalStore(nom, self.dossier, self.actif.colonnes,
+                                         INTERVALLE_SYNC_ARCHIVE_S, INTERVALLE_COMPLET_ARCHIVE_S)
+        self._index[nom] = IndexAgregats()
+
+    def rafraichir_catalogue(self, classeur, force=False):
+        """Liste les onglets d'archive du classeur (un seul appel, au plus toutes les DUREE_CATALOGUE_S)."""
+        with self._verrou:
+            if not force and time.time() - self._catalogue_le < DUREE_CATALOGUE_S:
+                return
+            for ws in classeur.worksheets():
+                if periode_archive(ws.title) is not None:
+                    self._worksheets[ws.title] = ws
+                    self._declarer(ws.title)
+            self._catalogue_le = time.time()
+
+    @property
+    def archives(self):
+        return sorted(self._stores, key=periode_archive)
+
+    def debut(self):
+        """Premier jour couvert par les archives (None sans archive)."""
+        archives = self.archives
+        return periode_archive(archives[0])[0] if archives else None
+
+    def touchees(self, debut=None, fin=None):
+        """Archives dont la période recoupe [debut, fin] (bornes optionnelles)."""
+        resultat = []
+        for nom in self.archives:
+            p_debut, p_fin = periode_archive(nom)
+            if (fin is None or p_debut <= fin) and (debut is None or p_fin >= debut):
+                resultat.append(nom)
+        return resultat
+
+    # --- LECTURE ---
+    def _worksheet(self, classeur, nom):
+        if nom not in self._worksheets:
+            self._worksheets[nom] = classeur.worksheet(nom)
+        return self._worksheets[nom]
+
+    def charger(self, debut=None, fin=None, classeur=None):
+        """Synchronise (si classeur) et indexe en parallèle les archives touchées. Retourne leurs noms.
+
+        Sans classeur, ou si la feuille est injoignable, la copie locale d'une archive est utilisée telle quelle.
+        """
+        noms = self.touchees(debut, fin)
+        def charger_un(nom):
+            store = self._stores[nom]
+            if classeur is not None:
+                try:
+                    store.synchroniser(self._worksheet(classeur, nom))
+                except Exception:
+                    if store.nb_lignes == 0: raise
+            self._index[nom].synchroniser(store)
+        if noms:
+            with ThreadPoolExecutor(max_workers=min(self.nb_threads, len(noms))) as pool:
+                # Chaque tâche hérite du contexte de l'appelant (profil d'instrumentation du rerun)
+                list(pool.map(lambda nom: contextvars.copy_context().run(charger_un, nom), noms))
+        return noms
+
+    def store(self, nom):
+        return self._stores[nom]
+
+    def totaux(self, debut, fin, index_actif, en_attente=None):
+        """Totaux de la période sur l'onglet actif et les archives touchées (après charger())."""
+        resultat = index_actif.totaux(debut, fin, en_attente=en_attente)
+        for nom in self.touchees(debut, fin):
+            for cle, val in self._index[nom].totaux(debut, fin).items():
+                resultat[cle] += val
+        return resultat
+
+    def bilan_familles(self, debut, fin, tous_les_plots, index_actif, en_attente=None):
+        """Net par famille sur l'onglet actif et les archives touchées (après charger())."""
+        resultat = index_actif.bilan_familles(debut, fin, tous_les_plots, en_attente=en_attente)
+        for nom in self.touchees(debut, fin):
+            for fam, val in self._index[nom].bilan_familles(debut, fin, tous_les_plots).items():
+                resultat[fam] = resultat.get(fam, 0) + val
+        return resultat
+
+    # --- ARCHIVAGE ---
+    def archiver(self, classeur, ws_actif, mode="clotures", granularite="annee", avant=None, annee_defaut=None):
+        """Déplace des lignes de l'onglet actif vers les onglets d'archive de leur période.
+
+        mode "clotures" : toutes les lignes des plots clôturés ; mode "periode" : les lignes datées avant `avant`.
+        Les lignes sans date lisible et les lignes de résumé restent dans l'onglet actif. Chaque étape est
+        rejouable : les lignes et résumés déjà écrits sont reconnus à leur clé. Les lignes archivées sont
+        supprimées en une seule requête, ce qui n'interfère pas avec les ajouts de la file d'écriture.
+        """
+        from gspread.exceptions import WorksheetNotFound  # Différé : la CLI hors ligne ne charge pas gspread
+        if granularite not in GRANULARITES:
+            raise ValueError(f"Granularité inconnue : {granularite}")
+        with self._verrou:
+            self.actif.synchroniser(ws_actif, complet=True)
+            # Un seul instantané : les lignes archivées et les positions supprimées viennent de la même vue,
+            # même si la file d'écriture synchronise de nouvelles lignes pendant l'archivage
+            brut, _, _ = self.actif.instantane()
+            lignes = brut.to_numpy(dtype=object).tolist()
+            journal = preparer_journal(brut, annee_defaut)
+            types = journal['Type'].astype(str).to_numpy()
+            notes = journal['Note'].astype(str).to_numpy()
+            plots = journal['Plot'].astype(str).to_numpy()
+            clotures = set(plots[(types == 'Clôture') | (notes == 'Clôture')])
+
+            selection = journal['Date_Obj'].notna().to_numpy() & (types != TYPE_RESUME)
+            if mode == "clotures":
+                selection &= np.isin(plots, list(clotures))
+            elif mode == "periode":
+                selection &= (journal['Date_Obj'] < pd.Timestamp(avant)).to_numpy()
+            else:
+                raise ValueError(f"Mode d'archivage inconnu : {mode}")
+            positions = np.flatnonzero(selection)
+            if not len(positions):
+                return {"lignes": 0, "onglets": {}, "resumes": 0}
+
+            # Lignes d'archive (date complète, montant numérique, clé garantie), regroupées par onglet puis par plot
+            i_date, i_montant, i_cle = (self.actif.colonnes.index(c) for c in ('Date', 'Montant', 'Cle'))
+            par_onglet = {}
+            for idx in positions:
+                ligne = list(lignes[idx])
+                jour = journal['Date_Obj'].iat[idx]
+                ligne[i_date] = jour.strftime("%d/%m/%Y")
+                montant = brut['Montant'].iat[idx]
+                ligne[i_montant] = montant.item() if isinstance(montant, np.generic) else montant
+                ligne[i_cle] = ligne[i_cle] or _cle_ligne(idx, lignes[idx])
+                par_onglet.setdefault(nom_archive(jour, granularite), {}).setdefault(plots[idx], []).append(
+                    (ligne, int(journal['Reel'].iat[idx]))
+                )
+
+            # 1. Écriture dans les archives (création de l'onglet si besoin)
+            for nom, par_plot in par_onglet.items():
+                try:
+                    ws = self._worksheet(classeur, nom)
+                    entete = []
+                except WorksheetNotFound:
+                    ws = classeur.add_worksheet(nom, rows=1000, cols=len(self.actif.colonnes))
+                    self._worksheets[nom] = ws
+                    entete = [list(self.actif.colonnes)]
+                self._declarer(nom)
+                store = self._stores[nom]
+                if not entete:
+                    store.synchroniser(ws, complet=True)
+                deja = {l[i_cle] for l in store.lignes()}
+                a_ecrire = [l for lignes_plot in par_plot.values() for l, _ in lignes_plot if l[i_cle] not in deja]
+                if entete or a_ecrire:
+                    ws.append_rows(entete + a_ecrire)
+                store.synchroniser(ws, complet=True)
+
+            # 2. Une ligne de résumé par plot et par archive dans l'onglet actif
+            deja = {l[i_cle] for l in lignes}
+            aujourd_hui = datetime.now().strftime("%d/%m/%Y")
+            resumes = []
+            for nom, par_plot in par_onglet.items():
+                for plot, lignes_plot in par_plot.items():
+                    cles = "|".join(sorted(l[i_cle] for l, _ in lignes_plot))
+                    cle = "resume-" + hashlib.sha1(f"{nom}|{plot}|{cles}".encode("utf-8")).hexdigest()[:16]
+                    if cle in deja:
+                        continue
+                    note = "Clôture" if plot in clotures else f"{len(lignes_plot)} ligne(s) archivée(s) dans {nom}"
+                    resume = [""] * len(self.actif.colonnes)
+                    resume[:5] = [aujourd_hui, plot, TYPE_RESUME, sum(r for _, r in lignes_plot), note]
+                    resume[i_cle] = cle
+                    resumes.append(resume)
+            if resumes:
+                ws_actif.append_rows(resumes)
+
+            # 3. Suppression des lignes archivées, du bas vers le haut (ligne Sheets = idx + 2)
+            blocs = []
+            for idx in positions[::-1]:
+                if blocs and blocs[-1][0] == idx + 2:
+                    blocs[-1][0] = idx + 1
+                else:
+                    blocs.append([idx + 1, idx + 2])
+            classeur.batch_update({"requests": [
+                {"deleteDimension": {"range": {"sheetId": ws_actif.id, "dimension": "ROWS", "startIndex": d, "endIndex": f}}}
+                for d, f in blocs
+            ]})
+            self.actif.synchroniser(ws_actif, complet=True)
+            return {
+                "lignes": int(len(positions)),
+                "onglets": {nom: sum(len(l) for l in par_plot.values()) for nom, par_plot in par_onglet.items()},
+                "resumes": len(resumes),
+            }
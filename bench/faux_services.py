@@ -0,0 +1,129 @@
+"""Doublures locales pour les benchmarks : feuille Google Sheets en mémoire et API gameinfo HTTP."""
+import re
+import json
+import time
+import random
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+
+class FausseFeuille:
+    """Sous-ensemble de gspread.Worksheet utilisé par l'application, en mémoire, avec compteurs d'appels."""
+
+    def __init__(self, entete, lignes=None, titre="Feuille"):
+        self.title = titre
+        self.valeurs = [list(entete)] + [list(l) for l in (lignes or [])]
+        self.lectures = 0
+        self.ecritures = 0
+
+    def get(self, plage=None, **kwargs):
+        self.lectures += 1
+        debut = int(re.match(r"[A-Z]+(\d+)", plage).group(1)) if plage else 1
+        return [[str(v) for v in l] for l in self.valeurs[debut - 1:]]
+
+    def get_all_values(self, **kwargs):
+        self.lectures += 1
+        return [[str(v) for v in l] for l in self.valeurs]
+
+    def append_rows(self, lignes, **kwargs):
+        self.ecritures += 1
+        self.valeurs += [list(l) for l in lignes]
+
+    def append_row(self, ligne, **kwargs):
+        self.append_rows([ligne])
+
+    def batch_update(self, donnees, **kwargs):
+        from gspread.utils import a1_to_rowcol
+        self.ecritures += 1
+        for d in donnees:
+            ligne, col = a1_to_rowcol(d['range'].split(':')[0])
+            for i, rangee in enumerate(d['values']):
+                while len(self.valeurs) < ligne + i:
+                    self.valeurs.append([])
+                cible = self.valeurs[ligne + i - 1]
+                for j, v in enumerate(rangee):
+                    while len(cible) < col + j:
+                        cible.append("")
+                    cible[col + j - 1] = v
+
+
+class FausseApiAlbion:
+    """Serveur HTTP local imitant les routes gameinfo `search`, `players` et `guilds/{id}/members`,
+    avec latence et 429 injectés. part_guilde_principale : proportion des joueurs dans « Guilde Principale »."""
+
+    def __init__(self, pseudos, latence_s=0.0, taux_429=0.0, taux_inconnus=0.05, part_guilde_principale=0.0, graine=0):
+        rnd = random.Random(graine)
+        self.latence_s = latence_s
+        self.taux_429 = taux_429
+        self.requetes = 0
+        self.erreurs_429 = 0
+        self._verrou = threading.Lock()
+        self._rnd = random.Random(graine + 1)
+        self.joueurs = {}
+        for i, pseudo in enumerate(pseudos):
+            if rnd.random() < taux_inconnus:
+                continue
+            guilde = "Guilde Principale" if rnd.random() < part_guilde_principale else f"Guilde {rnd.randint(0, 9)}"
+            self.joueurs[pseudo.lower()] = {
+                "Id": f"id{i}", "Name": pseudo, "GuildName": guilde, "AllianceName": rnd.choice(["", "ALL0", "ALL1"]),
+                "LifetimeStatistics": {"Crafting": {"Total": rnd.randint(0, 10 ** 8)}},
+            }
+        self.par_id = {j["Id"]: j for j in self.joueurs.values()}
+        self.guildes = {}
+        for j in self.joueurs.values():
+            self.guildes.setdefault(j["GuildName"], []).append(j)
+        self.id_guilde = {f"g{i}": nom for i, nom in enumerate(sorted(self.guildes))}
+        self._serveur = None
+
+    def _reponse(self, chemin, params):
+        if chemin.endswith("/search"):
+            q = params.get("q", [""])[0].lower()
+            joueur = self.joueurs.get(q)
+            guildes = [{"Id": i, "Name": nom} for i, nom in self.id_guilde.items() if nom.lower() == q]
+            return 200, {"players": [{"Id": joueur["Id"], "Name": joueur["Name"]}] if joueur else [], "guilds": guildes}
+        if chemin.endswith("/members"):
+            nom = self.id_guilde.get(chemin.rsplit("/", 2)[1])
+            return (200, self.guildes[nom]) if nom else (404, {})
+        if "/players/" in chemin:
+            joueur = self.par_id.get(chemin.rsplit("/", 1)[1])
+            return (200, joueur) if joueur else (404, {})
+        return 404, {}
+
+    def demarrer(self):
+        api = self
+
+        class Gestionnaire(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with api._verrou:
+                    api.requetes += 1
+                    limite = api._rnd.random() < api.taux_429
+                    api.erreurs_429 += limite
+                if api.latence_s:
+                    time.sleep(api.latence_s)
+                if limite:
+                    code, corps = 429, {}
+                else:
+                    url = urlparse(self.path)
+                    code, corps = api._reponse(url.path, parse_qs(url.query))
+                donnees = json.dumps(corps).encode()
+                self.send_response(code)
+                if code == 429:
+                    self.send_header("Retry-After", "0")
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(donnees)))
+                self.end_headers()
+                self.wfile.write(donnees)
+
+        self._serveur = ThreadingHTTPServer(("127.0.0.1", 0), Gestionnaire)
+        self._serveur.daemon_threads = True
+        threading.Thread(target=self._serveur.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self._serveur.server_port}/api/gameinfo"
+
+    def arreter(self):
+        if self._serveur:
+            self._serveur.shutdown()
+            self._serveur.server_close()
@@ -0,0 +1,59 @@
+"""Générateurs de données synthétiques pour les benchmarks (journal et exports de permissions)."""
+import json
+import random
+from datetime import date, timedelta
+
+FAMILLES = ["Tissu", "Cuir", "Fibre", "Minerai", "Bois", "Pierre", "Peau", "Coton", "Lin", "Chanvre",
+            "Acier", "Bronze", "Forge", "Atelier", "Ferme", "Herbe", "Élevage", "Alchimie", "Cuisine", "Outils"]
+
+
+def generer_journal(nb_lignes, nb_plots=60, annees=3, taux_sans_annee=0.05, taux_date_invalide=0.002, graine=0):
+    """Lignes brutes du journal [Date, Plot, Type, Montant, Note, Cle] sur plusieurs années.
+
+    Chaque plot est ouvert (Dépense « Ouverture »), reçoit des recettes et dépenses, et une partie
+    est clôturée (Recette « Clôture »). Une fraction des dates est saisie sans année (jj/mm).
+    """
+    rnd = random.Random(graine)
+    nb_plots = max(1, min(nb_plots, nb_lignes // 4))
+    debut = date.today() - timedelta(days=365 * annees)
+    plots = [f"{FAMILLES[i % len(FAMILLES)]} {i // len(FAMILLES) + 1}" for i in range(nb_plots)]
+    fermes = set(rnd.sample(plots, nb_plots // 3))
+
+    def format_date(jour):
+        tirage = rnd.random()
+        if tirage < taux_date_invalide: return "??"
+        if tirage < taux_date_invalide + taux_sans_annee: return jour.strftime("%d/%m")
+        return jour.strftime("%d/%m/%Y")
+
+    lignes = [[format_date(debut), p, "Dépense (-)", rnd.randint(5, 40) * 1000000, "Ouverture", ""] for p in plots]
+    nb_courantes = max(0, nb_lignes - len(lignes) - len(fermes))
+    for i in range(nb_courantes):
+        jour = debut + timedelta(days=int(365 * annees * i / max(nb_courantes, 1)))
+        cible = rnd.choice(plots) if rnd.random() < 0.95 else rnd.choice(["Taxe Guilde", "Autre"])
+        type_op = "Recette (+)" if rnd.random() < 0.6 else "Dépense (-)"
+        lignes.append([format_date(jour), cible, type_op, rnd.randint(1, 500) * 10000, "", ""])
+    for p in fermes:
+        lignes.append([date.today().strftime("%d/%m/%Y"), p, "Recette (+)", rnd.randint(1, 20) * 1000000, "Clôture", ""])
+    return lignes[:nb_lignes]
+
+
+def generer_pseudos(nb, graine=0):
+    rnd = random.Random(graine)
+    syllabes = ["ka", "ro", "mi", "zen", "tor", "ul", "ix", "dra", "vel", "sha", "nor", "gum", "lo", "pex"]
+    pseudos = set()
+    while len(pseudos) < nb:
+        pseudos.add("".join(rnd.choice(syllabes) for _ in range(rnd.randint(2, 4))).capitalize() + str(rnd.randint(0, 99)))
+    return sorted(pseudos)
+
+
+def generer_export(pseudos, doublons=3, nb_guildes=5, nb_alliances=2, graine=0):
+    """Export de permissions au format JSON : chaque joueur apparaît jusqu'à `doublons` fois (plusieurs plots)."""
+    rnd = random.Random(graine)
+    entrees = []
+    for pseudo in pseudos:
+        for _ in range(rnd.randint(1, doublons)):
+            entrees.append({"Principal": f"Player:{pseudo}", "AccessRights": rnd.choice(["Use", "Build", "Manage"])})
+    entrees += [{"Principal": f"Guild:Guilde {i}", "AccessRights": "Use"} for i in range(nb_guildes)]
+    entrees += [{"Principal": f"Alliance:ALL{i}", "AccessRights": "Use"} for i in range(nb_alliances)]
+    rnd.shuffle(entrees)
+    return json.dumps({"Permissions": entrees}, ensure_ascii=False)
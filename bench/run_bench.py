@@ -0,0 +1,184 @@
+"""Benchmark des chemins critiques de l'application (trésorerie et scanner), hors Streamlit.
+
+Usage (depuis la racine du dépôt) :
+    python -m bench.run_bench --lignes 1000,10000,100000 --joueurs 300 --latence-ms 20 --taux-429 0.02
+    python -m bench.run_bench --lignes 1000000 --sans-scanner --json resultats.json
+    python -m bench.run_bench --sans-tresorerie --sessions 5
+
+Chaque étape est chronométrée et son pic mémoire (tracemalloc) est relevé. tracemalloc ralentit
+nettement le code Python : utiliser --sans-memoire pour des durées non faussées. Les Google Sheets
+sont remplacées par une feuille en mémoire et l'API gameinfo par un serveur HTTP local.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+import threading
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from bench.generateurs import generer_journal, generer_pseudos, generer_export
+from bench.faux_services import FausseFeuille, FausseApiAlbion
+
+
+class Mesures:
+    def __init__(self, memoire=True):
+        self.memoire = memoire
+        self.resultats = []
+
+    @contextmanager
+    def etape(self, scenario, nom, **infos):
+        if self.memoire:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        debut = time.perf_counter()
+        yield
+        duree = time.perf_counter() - debut
+        pic = tracemalloc.get_traced_memory()[1] - base if self.memoire else 0
+        self.resultats.append({"scenario": scenario, "etape": nom, "duree_ms": round(duree * 1000, 2),
+                               "pic_memoire_mo": round(pic / 1e6, 2), **infos})
+
+    def afficher(self):
+        largeur = max(len(f"{r['scenario']} / {r['etape']}") for r in self.resultats)
+        print(f"{'Étape':<{largeur}}  {'Durée (ms)':>12}  {'Pic mém. (Mo)':>14}  Infos")
+        for r in self.resultats:
+            infos = {k: v for k, v in r.items() if k not in ("scenario", "etape", "duree_ms", "pic_memoire_mo")}
+            print(f"{r['scenario'] + ' / ' + r['etape']:<{largeur}}  {r['duree_ms']:>12.2f}  {r['pic_memoire_mo']:>14.2f}  "
+                  f"{' '.join(f'{k}={v}' for k, v in infos.items())}")
+
+
+def bench_tresorerie(mesures, nb_lignes, dossier):
+    """Onglet 2 : synchronisation du miroir, préparation, index d'agrégats, totaux et historique."""
+    from journal_store import JournalStore, COLONNES_JOURNAL
+    from ledger import preparer_journal, filtrer_periode, totaux, bilan_familles, IndexAgregats
+
+    scenario = f"journal {nb_lignes}"
+    feuille = FausseFeuille(COLONNES_JOURNAL, generer_journal(nb_lignes), titre="Journal_App")
+    store = JournalStore("Journal_App", dossier=dossier)
+
+    with mesures.etape(scenario, "sync complète"):
+        store.synchroniser(feuille, complet=True)
+    feuille.append_rows(generer_journal(40, graine=1)[-10:])
+    with mesures.etape(scenario, "sync incrémentale (+10)"):
+        store.synchroniser(feuille, force=True)
+    with mesures.etape(scenario, "chargement DataFrame"):
+        brut = store.charger()
+    with mesures.etape(scenario, "preparer_journal"):
+        journal = preparer_journal(brut)
+    index = IndexAgregats()
+    with mesures.etape(scenario, "index agrégats (construction)"):
+        index.synchroniser(store)
+    feuille.append_rows(generer_journal(40, graine=2)[-10:])
+    store.synchroniser(feuille, force=True)
+    with mesures.etape(scenario, "index agrégats (ajout +10)"):
+        index.synchroniser(store)
+
+    journal = preparer_journal(store.charger())
+    tous_les_plots = [p for p in journal['Plot'].unique() if str(p).strip() not in ["", "Taxe Guilde", "Autre"]]
+    debut, fin = date.today() - timedelta(days=400), date.today()
+    with mesures.etape(scenario, "totaux période (parcours)"):
+        periode = filtrer_periode(journal, debut, fin)
+        attendu = (totaux(periode), bilan_familles(periode, tous_les_plots))
+    with mesures.etape(scenario, "totaux période (index)"):
+        obtenu = (index.totaux(debut, fin), index.bilan_familles(debut, fin, tous_les_plots))
+    if obtenu != attendu:
+        raise AssertionError(f"{scenario} : l'index d'agrégats diverge du parcours complet")
+    with mesures.etape(scenario, "tri historique"):
+        periode.sort_values(by='Date_Obj', ascending=False)
+    store._conn.close()
+
+
+def bench_scanner(mesures, nb_joueurs, latence_s, taux_429, dossier, rps, threads, part_guilde=0.0, par_guilde=True,
+                  sessions=1):
+    """Onglet 3 : analyse de l'export, résolution des joueurs (cache froid puis chaud) et référence.
+
+    sessions > 1 : le même export est scanné en même temps par autant de sessions sur le client partagé.
+    """
+    import albion_api
+    from albion_api import ClientAlbion
+    from cache_joueurs import CacheJoueurs
+    from scanner import analyser_export
+    from reference import IndexReference
+
+    scenario = f"scan {nb_joueurs} joueurs" + (f", guilde {part_guilde:.0%}" if part_guilde else "") + ("" if par_guilde else ", sans effectifs")
+    scenario += f", {sessions} sessions" if sessions > 1 else ""
+    pseudos = generer_pseudos(nb_joueurs)
+    export = generer_export(pseudos)
+    api = FausseApiAlbion(pseudos, latence_s=latence_s, taux_429=taux_429, part_guilde_principale=part_guilde)
+    albion_api.BACKOFF_S = 0.05
+    try:
+        client = ClientAlbion(requetes_par_seconde=rps, nb_threads=threads, api_base=api.demarrer(),
+                              cache=CacheJoueurs(dossier=dossier))
+        feuille_ref = FausseFeuille(["Pseudo"], [[p] for p in pseudos[::2]], titre="Reference_Craft")
+        reference = IndexReference()
+
+        with mesures.etape(scenario, "analyse export", taille_ko=len(export) // 1024):
+            resultat = analyser_export(export)
+        with mesures.etape(scenario, "chargement référence"):
+            reference.charger(feuille_ref)
+        for passe in ("cache froid", "cache chaud"):
+            requetes_avant = api.requetes
+            with mesures.etape(scenario, f"résolution joueurs ({passe})"):
+                scans = [None] * sessions
+                def scanner(s):
+                    scans[s] = client.resoudre_joueurs(resultat.joueurs, par_guilde=par_guilde)
+                fils = [threading.Thread(target=scanner, args=(s,)) for s in range(sessions)]
+                for fil in fils: fil.start()
+                for fil in fils: fil.join()
+                fiches = scans[0]
+                for fiche in fiches:
+                    fiche['Statut'] = reference.est_connu(fiche.get('Pseudo', ''))
+            mesures.resultats[-1].update(requetes_http=api.requetes - requetes_avant, erreurs_429=api.erreurs_429)
+        with mesures.etape(scenario, "sauvegarde référence"):
+            reference.sauvegarder(feuille_ref, fiches)
+    finally:
+        api.arreter()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lignes", default="1000,10000,100000", help="Tailles de journal, séparées par des virgules")
+    parser.add_argument("--joueurs", default="300", help="Nombres de joueurs dans l'export, séparés par des virgules")
+    parser.add_argument("--latence-ms", type=float, default=20.0, help="Latence simulée de l'API gameinfo")
+    parser.add_argument("--taux-429", type=float, default=0.02, help="Proportion de réponses 429 injectées")
+    parser.add_argument("--rps", type=float, default=50.0, help="Limite de requêtes/seconde du client")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--part-guilde", type=float, default=0.0, help="Proportion des joueurs dans une même guilde")
+    parser.add_argument("--sans-effectifs", action="store_true", help="Désactive la résolution par effectif de guilde")
+    parser.add_argument("--sessions", type=int, default=1, help="Sessions qui scannent le même export en même temps")
+    parser.add_argument("--sans-tresorerie", action="store_true")
+    parser.add_argument("--sans-scanner", action="store_true")
+    parser.add_argument("--sans-memoire", action="store_true", help="Désactive tracemalloc (durées plus fidèles)")
+    parser.add_argument("--json", help="Écrit aussi les résultats dans ce fichier JSON")
+    args = parser.parse_args(argv)
+
+    mesures = Mesures(memoire=not args.sans_memoire)
+    if mesures.memoire:
+        tracemalloc.start()
+    dossier = tempfile.mkdtemp(prefix="albion-bench-")
+    try:
+        if not args.sans_tresorerie:
+            for nb in [int(n) for n in args.lignes.split(",") if n]:
+                bench_tresorerie(mesures, nb, os.path.join(dossier, f"journal-{nb}"))
+        if not args.sans_scanner:
+            for nb in [int(n) for n in args.joueurs.split(",") if n]:
+                bench_scanner(mesures, nb, args.latence_ms / 1000, args.taux_429,
+                              os.path.join(dossier, f"scan-{nb}"), args.rps, args.threads, args.part_guilde, not args.sans_effectifs,
+                              args.sessions)
+    finally:
+        tracemalloc.stop()
+        shutil.rmtree(dossier, ignore_errors=True)
+
+    mesures.afficher()
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(mesures.resultats, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+from config import DOSSIER_DATA
+from instrumentation import compter_cache
+
+# --- CONFIGURATION DU CACHE JOUEURS ---
+FICHIER_CACHE = "joueurs.sqlite"
+TTL_TROUVE_S = 24 * 3600     # Guilde et Craft Fame bougent peu dans la journée
+TTL_INCONNU_S = 3600         # Un pseudo introuvable peut être créé / renommé entre-temps
+TAILLE_MAX = 20000           # Au-delà, les entrées les moins récemment utilisées sont évincées
+
+
+class CacheJoueurs:
+    """Cache disque (SQLite) des fiches joueurs résolues, par serveur et pseudo en minuscules.
+
+    Les entrées expirent après leur TTL (plus court pour les « introuvables ») et le cache est borné
+    en taille par une éviction LRU.
+    """
+
+    def __init__(self, dossier=DOSSIER_DATA, ttl=TTL_TROUVE_S, ttl_inconnu=TTL_INCONNU_S, taille_max=TAILLE_MAX):
+        os.makedirs(dossier, exist_ok=True)
+        self.ttl = ttl
+        self.ttl_inconnu = ttl_inconnu
+        self.taille_max = taille_max
+        self.hits = 0
+        self.misses = 0
+        self._verrou = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(dossier, FICHIER_CACHE), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS joueurs (serveur TEXT NOT NULL, pseudo TEXT NOT NULL, fiche TEXT NOT NULL, "
+            "expire REAL NOT NULL, dernier_acces REAL NOT NULL, PRIMARY KEY (serveur, pseudo))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_joueurs_acces ON joueurs (dernier_acces)")
+        self._conn.commit()
+
+    def lire(self, serveur, pseudos):
+        """Retourne {pseudo: fiche} pour les pseudos présents et non expirés (les autres sont absents).
+
+        Les graphies qui ne diffèrent que par la casse (« Bob », « bob ») partagent la même entrée du cache.
+        """
+        orthographes = {}
+        for p in pseudos:
+            graphies = orthographes.setdefault(str(p).lower(), [])
+            if p not in graphies:
+                graphies.append(p)
+        cles = list(orthographes.items())
+        if not cles:
+            return {}
+        nb_pseudos = sum(len(graphies) for graphies in orthographes.values())
+        maintenant = time.time()
+        trouves = {}
+        with self._verrou:
+            for i in range(0, len(cles), 500):
+                lot = dict(cles[i:i + 500])
+                rows = self._conn.execute(
+                    f"SELECT pseudo, fiche FROM joueurs WHERE serveur = ? AND expire > ? "
+                    f"AND pseudo IN ({','.join('?' * len(lot))})",
+                    (serveur, maintenant, *lot),
+                ).fetchall()
+                for cle, fiche in rows:
+                    for p in lot[cle]:
+                        trouves[p] = json.loads(fiche)
+            if trouves:
+                self._conn.executemany(
+                    "UPDATE joueurs SET dernier_acces = ? WHERE serveur = ? AND pseudo = ?",
+                    [(maintenant, serveur, cle) for cle in {str(p).lower() for p in trouves}],
+                )
+                self._conn.commit()
+            self.hits += len(trouves)
+            self.misses += nb_pseudos - len(trouves)
+        compter_cache("joueurs", hits=len(trouves), misses=nb_pseudos - len(trouves))
+        return trouves
+
+    def ecrire(self, serveur, pseudo, fiche):
+        """Enregistre une fiche ; le TTL dépend de fiche['Trouve']."""
+        maintenant = time.time()
+        ttl = self.ttl if fiche.get("Trouve") else self.ttl_inconnu
+        with self._verrou:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO joueurs (serveur, pseudo, fiche, expire, dernier_acces) VALUES (?, ?, ?, ?, ?)",
+                (serveur, str(pseudo).lower(), json.dumps(fiche, ensure_ascii=False), maintenant + ttl, maintenant),
+            )
+            self._evincer()
+            self._conn.commit()
+
+    def _evincer(self):
+        """Supprime les entrées expirées puis, si besoin, les moins récemment utilisées."""
+        nb = self._conn.execute("SELECT COUNT(*) FROM joueurs").fetchone()[0]
+        if nb <= self.taille_max:
+            return
+        self._conn.execute("DELETE FROM joueurs WHERE expire <= ?", (time.time(),))
+        nb = self._conn.execute("SELECT COUNT(*) FROM joueurs").fetchone()[0]
+        if nb > self.taille_max:
+            self._conn.execute(
+                "DELETE FROM joueurs WHERE rowid IN (SELECT rowid FROM joueurs ORDER BY dernier_acces LIMIT ?)",
+                (nb - self.taille_max,),
+            )
+
+    def vider(self):
+        with self._verrou:
+            self._conn.execute("DELETE FROM joueurs")
+            self._conn.commit()
@@ -0,0 +1,121 @@
+"""Accès en ligne de commande au journal et au scanner, sans Streamlit.
+
+Exemples :
+    python cli.py report --from 01/01/2025 --to 31/03/2025 --by family --format csv
+    python cli.py report --by plot --format json --hors-ligne
+    python cli.py scan export.json --format csv
+
+Les imports lourds (pandas, gspread) sont faits à la demande : `scan` ne charge ni l'un ni l'autre.
+"""
+import sys
+import csv
+import json
+import argparse
+from datetime import datetime
+
+
+def _date(texte):
+    for fmt in ("%d/%m/%Y", "%Y-%m-%d"):
+        try: return datetime.strptime(texte, fmt).date()
+        except ValueError: pass
+    raise argparse.ArgumentTypeError(f"Date invalide : {texte} (jj/mm/aaaa ou aaaa-mm-jj)")
+
+
+def _ecrire(lignes, format_sortie, sortie):
+    if format_sortie == "json":
+        json.dump(lignes, sortie, ensure_ascii=False, indent=2)
+        sortie.write("\n")
+    elif lignes:
+        colonnes = list(dict.fromkeys(c for l in lignes for c in l))
+        writer = csv.DictWriter(sortie, fieldnames=colonnes, extrasaction="ignore", lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(lignes)
+
+
+def commande_report(args):
+    import pandas as pd
+    from config import NOM_ONGLET_JOURNAL
+    from journal_store import JournalStore
+    from archives import JournalReparti
+    from ledger import preparer_journal, rapport
+
+    store = JournalStore(NOM_ONGLET_JOURNAL)
+    reparti = JournalReparti(store)
+    classeur = None
+    if not args.hors_ligne:
+        # Seul le delta depuis la dernière synchronisation est téléchargé
+        from sheets import ouvrir_classeur
+        classeur = ouvrir_classeur()
+        store.synchroniser(classeur.worksheet(NOM_ONGLET_JOURNAL), force=True)
+        reparti.rafraichir_catalogue(classeur, force=True)
+    elif store.nb_lignes == 0:
+        raise SystemExit("Miroir local vide : lancez une première fois sans --hors-ligne.")
+
+    # Seules les archives recoupant la période sont lues
+    archives = reparti.charger(args.debut, args.fin, classeur)
+    brut = pd.concat([store.charger()] + [reparti.store(nom).charger() for nom in archives], ignore_index=True)
+    return rapport(preparer_journal(brut), args.debut, args.fin, par=args.par)
+
+
+def commande_scan(args):
+    from albion_api import ClientAlbion
+    from cache_joueurs import CacheJoueurs
+    from scanner import analyser_export
+
+    with open(args.export, "rb") as f:
+        export = analyser_export(f)
+    joueurs = export.joueurs
+    client = ClientAlbion(requetes_par_seconde=args.rps, cache=None if args.sans_cache else CacheJoueurs())
+    resultats = client.resoudre_joueurs(joueurs, force=args.force, par_guilde=not args.sans_effectifs)
+
+    index_reference = None
+    if args.reference:
+        from config import NOM_ONGLET_REF
+        from sheets import ouvrir_classeur
+        from reference import IndexReference
+        index_reference = IndexReference()
+        index_reference.charger(ouvrir_classeur().worksheet(NOM_ONGLET_REF))
+
+    for p_name, infos in zip(joueurs, resultats):
+        p_lower = str(infos.get('Pseudo', p_name)).lower()
+        infos['Occurrences'] = export.occurrences["Player"].get(p_lower, 1)
+        if index_reference is not None:
+            infos['Statut'] = "Connu" if index_reference.est_connu(p_lower) else "Nouveau"
+    return resultats
+
+
+def main(argv=None):
+    sortie = argparse.ArgumentParser(add_help=False)
+    sortie.add_argument("--format", choices=["csv", "json"], default="csv")
+    sortie.add_argument("--output", "-o", help="Fichier de sortie (défaut : sortie standard)")
+    parser = argparse.ArgumentParser(prog="cli.py", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sous = parser.add_subparsers(dest="commande", required=True)
+
+    p_report = sous.add_parser("report", parents=[sortie], help="Trésorerie d'une période")
+    p_report.add_argument("--from", dest="debut", type=_date, help="Début (défaut : première transaction)")
+    p_report.add_argument("--to", dest="fin", type=_date, help="Fin (défaut : aujourd'hui)")
+    p_report.add_argument("--by", dest="par", choices=["total", "family", "plot", "day"], default="total")
+    p_report.add_argument("--hors-ligne", action="store_true", help="Utilise le miroir local sans interroger Google Sheets")
+    p_report.set_defaults(executer=commande_report)
+
+    p_scan = sous.add_parser("scan", parents=[sortie], help="Analyse d'un export de permissions")
+    p_scan.add_argument("export", help="Fichier d'export (JSON / texte)")
+    p_scan.add_argument("--rps", type=float, default=10.0, help="Requêtes/seconde vers l'API Albion")
+    p_scan.add_argument("--force", action="store_true", help="Ignore le cache joueurs (le met à jour)")
+    p_scan.add_argument("--sans-cache", action="store_true", help="N'utilise pas du tout le cache joueurs")
+    p_scan.add_argument("--sans-effectifs", action="store_true", help="Résout chaque joueur séparément, sans l'effectif de sa guilde")
+    p_scan.add_argument("--reference", action="store_true", help="Compare à l'onglet de référence (Google Sheets)")
+    p_scan.set_defaults(executer=commande_scan)
+
+    args = parser.parse_args(argv)
+    lignes = args.executer(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as f:
+            _ecrire(lignes, args.format, f)
+    else:
+        _ecrire(lignes, args.format, sys.stdout)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,13 @@
+import os
+
+# --- CONFIGURATION FICHIERS ---
+# Partagée par l'application Streamlit et la CLI (aucune dépendance lourde ici)
+NOM_DU_FICHIER_SHEET = "Arion Plot"
+NOM_ONGLET_JOURNAL = "Journal_App"
+NOM_ONGLET_REF = "Reference_Craft"
+PREFIXE_ARCHIVE = "Archive_"   # Onglets d'archive du journal : Archive_2024, Archive_2025_T1, ...
+
+FICHIER_COMPTE_SERVICE = "service_account.json"
+FICHIER_SECRETS = os.path.join(".streamlit", "secrets.toml")
+
+DOSSIER_DATA = os.environ.get("ALBION_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
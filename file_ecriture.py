@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+
+from gspread.exceptions import APIError
+
+from config import DOSSIER_DATA
+
+# --- CONFIGURATION DE LA FILE D'ÉCRITURE ---
+FICHIER_FILE = "file_ecriture.sqlite"
+INTERVALLE_FLUSH_S = 2       # Regroupement des saisies rapprochées dans un même append_rows
+TAILLE_LOT = 200
+NB_ESSAIS_MAX = 5            # Hors erreurs de quota, qui sont réessayées sans limite
+BACKOFF_MAX_S = 300
+DUREE_HISTORIQUE_S = 7 * 24 * 3600   # Conservation des lignes confirmées (diagnostic)
+
+EN_ATTENTE, EN_COURS, ECRIT, ECHEC = "attente", "envoi", "ecrit", "echec"
+
+
+def _est_erreur_quota(e):
+    return isinstance(e, APIError) and getattr(e, "code", None) == 429
+
+
+class FileEcriture:
+    """File d'écriture durable (write-ahead, SQLite) vers l'onglet journal.
+
+    Chaque transaction reçoit une clé d'idempotence écrite dans la dernière colonne du journal. Un thread
+    de fond envoie les lignes par lots via append_rows, réessaie avec backoff sur les erreurs de quota et,
+    avant de renvoyer un lot dont l'issue est inconnue, vérifie dans le miroir local quelles clés sont
+    déjà présentes dans la feuille pour ne rien écrire deux fois.
+    """
+
+    def __init__(self, store, dossier=DOSSIER_DATA, intervalle=INTERVALLE_FLUSH_S):
+        os.makedirs(dossier, exist_ok=True)
+        self.store = store
+        self.intervalle = intervalle
+        self._verrou = threading.Lock()
+        self._reveil = threading.Event()
+        self._thread = None
+        self._conn = sqlite3.connect(os.path.join(dossier, FICHIER_FILE), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS file (cle TEXT PRIMARY KEY, onglet TEXT NOT NULL, valeurs TEXT NOT NULL, "
+            "statut TEXT NOT NULL, essais INTEGER NOT NULL DEFAULT 0, erreur TEXT NOT NULL DEFAULT '', "
+            "prochain_essai REAL NOT NULL DEFAULT 0, cree REAL NOT NULL, tente INTEGER NOT NULL DEFAULT 0)"
+        )
+        # « tente » : la ligne a déjà été envoyée au moins une fois (jamais remis à zéro, contrairement à essais)
+        colonnes = {r[1] for r in self._conn.execute("PRAGMA table_info(file)").fetchall()}
+        if "tente" not in colonnes:
+            self._conn.execute("ALTER TABLE file ADD COLUMN tente INTEGER NOT NULL DEFAULT 0")
+            self._conn.execute("UPDATE file SET tente = 1 WHERE essais > 0")
+        # Un envoi interrompu (arrêt du processus) a une issue inconnue : il repasse en attente
+        self._conn.execute("UPDATE file SET statut = ? WHERE statut = ?", (EN_ATTENTE, EN_COURS))
+        self._conn.commit()
+
+    # --- SAISIE ---
+    def ajouter(self, valeurs):
+        """Met une ligne (sans clé) en file ; elle est visible immédiatement via en_attente(). Retourne sa clé."""
+        cle = uuid.uuid4().hex
+        with self._verrou:
+            self._conn.execute(
+                "INSERT INTO file (cle, onglet, valeurs, statut, cree) VALUES (?, ?, ?, ?, ?)",
+                (cle, self.store.onglet, json.dumps(list(valeurs) + [cle], ensure_ascii=False), EN_ATTENTE, time.time()),
+            )
+            self._conn.commit()
+        self._reveil.set()
+        return cle
+
+    def en_attente(self):
+        """Lignes pas encore confirmées dans la feuille (en attente, en cours d'envoi ou en échec)."""
+        with self._verrou:
+            rows = self._conn.execute(
+                "SELECT valeurs, statut FROM file WHERE onglet = ? AND statut != ? ORDER BY cree", (self.store.onglet, ECRIT)
+            ).fetchall()
+        lignes = [json.loads(v) for v, _ in rows]
+        if any(statut == EN_COURS for _, statut in rows):
+            # Un lot en cours peut déjà être dans le miroir local : on évite de l'afficher deux fois
+            recentes = {l[-1] for l in self.store.lignes(depuis=max(0, self.store.nb_lignes - TAILLE_LOT))}
+            lignes = [l for l in lignes if l[-1] not in recentes]
+        return lignes
+
+    def etat(self):
+        """Compteurs par statut et dernière erreur, pour l'indicateur de l'interface."""
+        with self._verrou:
+            compteurs = dict(self._conn.execute(
+                "SELECT statut, COUNT(*) FROM file WHERE statut != ? GROUP BY statut", (ECRIT,)
+            ).fetchall())
+            erreur = self._conn.execute(
+                "SELECT erreur FROM file WHERE statut != ? AND erreur != '' ORDER BY cree DESC LIMIT 1", (ECRIT,)
+            ).fetchone()
+        return {
+            "attente": compteurs.get(EN_ATTENTE, 0) + compteurs.get(EN_COURS, 0),
+            "echec": compteurs.get(ECHEC, 0),
+            "erreur": erreur[0] if erreur else "",
+        }
+
+    def relancer_echecs(self):
+        """Remet les lignes en échec dans la file (leurs clés seront vérifiées dans le miroir avant renvoi)."""
+        with self._verrou:
+            self._conn.execute(
+                "UPDATE file SET statut = ?, essais = 0, prochain_essai = 0 WHERE statut = ?", (EN_ATTENTE, ECHEC)
+            )
+            self._conn.commit()
+        self._reveil.set()
+
+    # --- ENVOI ---
+    def vider(self, worksheet):
+        """Envoie un lot de lignes prêtes. Retourne le nombre de lignes confirmées dans la feuille."""
+        with self._verrou:
+            rows = self._conn.execute(
+                "SELECT cle, valeurs, essais, tente FROM file WHERE onglet = ? AND statut = ? AND prochain_essai <= ? "
+                "ORDER BY cree LIMIT ?",
+                (self.store.onglet, EN_ATTENTE, time.time(), TAILLE_LOT),
+            ).fetchall()
+            if not rows:
+                return 0
+            # Le compteur d'essais est incrémenté dès la prise en charge : un arrêt brutal pendant l'envoi
+            # laisse une trace et déclenchera la vérification d'idempotence au prochain essai
+            self._conn.executemany(
+                "UPDATE file SET statut = ?, essais = essais + 1, tente = 1 WHERE cle = ?", [(EN_COURS, r[0]) for r in rows]
+            )
+            self._conn.commit()
+
+        try:
+            # Idempotence : un lot déjà tenté a pu être écrit sans que la réponse nous parvienne
+            deja_ecrites = set()
+            if any(tente for *_, tente in rows):
+                self.store.synchroniser(worksheet, force=True)
+                cles = {cle for cle, *_ in rows}
+                deja_ecrites = {l[-1] for l in self.store.lignes() if l[-1] in cles}
+            a_ecrire = [json.loads(v) for cle, v, *_ in rows if cle not in deja_ecrites]
+            if a_ecrire:
+                worksheet.append_rows(a_ecrire)
+                self.store.synchroniser(worksheet, force=True)
+        except Exception as e:
+            self._echec(rows, e)
+            return 0
+
+        with self._verrou:
+            self._conn.executemany(
+                "UPDATE file SET statut = ?, erreur = '' WHERE cle = ?", [(ECRIT, r[0]) for r in rows]
+            )
+            self._conn.execute("DELETE FROM file WHERE statut = ? AND cree < ?", (ECRIT, time.time() - DUREE_HISTORIQUE_S))
+            self._conn.commit()
+        return len(rows)
+
+    def _echec(self, rows, e):
+        quota = _est_erreur_quota(e)
+        maj = []
+        for cle, _, essais, _ in rows:
+            essais += 1
+            statut = EN_ATTENTE if quota or essais < NB_ESSAIS_MAX else ECHEC
+            attente = min(BACKOFF_MAX_S, self.intervalle * 2 ** essais)
+            maj.append((statut, essais, f"{'Quota Sheets atteint' if quota else 'Erreur'} : {e}", time.time() + attente, cle))
+        with self._verrou:
+            self._conn.executemany(
+                "UPDATE file SET statut = ?, essais = ?, erreur = ?, prochain_essai = ? WHERE cle = ?", maj
+            )
+            self._conn.commit()
+
+    def demarrer(self, worksheet):
+        """Lance (une seule fois) le thread d'envoi en arrière-plan."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        def boucle():
+            while True:
+                self._reveil.wait(self.intervalle)
+                self._reveil.clear()
+                # Laisse le temps aux saisies rapprochées de rejoindre le même lot
+                time.sleep(self.intervalle)
+                while self.vider(worksheet):
+                    pass
+        self._thread = threading.Thread(target=boucle, name="file-ecriture", daemon=True)
+        self._thread.start()
@@ -0,0 +1,129 @@
+import os
+import json
+import time
+import logging
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+# --- INSTRUMENTATION DES RERUNS ---
+FICHIER_LOG_PERF = "perf.jsonl"
+TAILLE_MAX_LOG = 10 * 1024 * 1024
+
+_profil_courant = contextvars.ContextVar("profil_courant", default=None)
+_logger = logging.getLogger("albion.perf")
+
+
+class Profil:
+    """Mesures d'un rerun : durée des étapes, appels Sheets / HTTP et taux de succès des caches."""
+
+    def __init__(self, session_id=""):
+        self.session_id = session_id
+        self.debut = time.time()
+        self._t0 = time.perf_counter()
+        self.etapes = {}
+        self.sheets = {"lectures": 0, "ecritures": 0, "latences_ms": []}
+        self.http = {"statuts": {}, "latences_ms": []}
+        self.caches = {}
+        self.infos = {}         # Contexte libre ajouté au journal (ex : statut d'un scan)
+        self.ecrit = False
+
+    @contextmanager
+    def etape(self, nom):
+        debut = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.etapes[nom] = self.etapes.get(nom, 0.0) + (time.perf_counter() - debut) * 1000
+
+    def _appel(self, categorie, methode, statut, latence_ms):
+        if categorie == "sheets":
+            self.sheets["ecritures" if methode in ("POST", "PUT", "PATCH", "DELETE") else "lectures"] += 1
+            self.sheets["latences_ms"].append(latence_ms)
+        else:
+            self.http["statuts"][str(statut)] = self.http["statuts"].get(str(statut), 0) + 1
+            self.http["latences_ms"].append(latence_ms)
+
+    def _cache(self, nom, hits, misses):
+        compteur = self.caches.setdefault(nom, {"hits": 0, "misses": 0})
+        compteur["hits"] += hits
+        compteur["misses"] += misses
+
+    def resume(self, interrompu=False):
+        """Dictionnaire sérialisable (une ligne du journal de performances)."""
+        def stats(latences):
+            if not latences: return {"nb": 0}
+            return {"nb": len(latences), "moy_ms": round(sum(latences) / len(latences), 1), "max_ms": round(max(latences), 1)}
+        return {
+            "ts": round(self.debut, 3),
+            "session": self.session_id,
+            "total_ms": round((time.perf_counter() - self._t0) * 1000, 1),
+            "interrompu": interrompu,
+            "etapes_ms": {k: round(v, 1) for k, v in self.etapes.items()},
+            "sheets": {"lectures": self.sheets["lectures"], "ecritures": self.sheets["ecritures"], **stats(self.sheets["latences_ms"])},
+            "http": {"statuts": self.http["statuts"], **stats(self.http["latences_ms"])},
+            "caches": {
+                nom: {**c, "taux": round(c["hits"] / (c["hits"] + c["misses"]), 3) if c["hits"] + c["misses"] else None}
+                for nom, c in self.caches.items()
+            },
+            **({"infos": dict(self.infos)} if self.infos else {}),
+        }
+
+
+def demarrer_profil(session_id=""):
+    """Crée le profil du rerun et le rend courant pour le thread (et les tâches lancées avec son contexte)."""
+    profil = Profil(session_id)
+    _profil_courant.set(profil)
+    return profil
+
+
+def profil_courant():
+    return _profil_courant.get()
+
+
+@contextmanager
+def etape(nom):
+    """Chronomètre une étape du profil courant (sans effet hors d'un rerun instrumenté)."""
+    profil = _profil_courant.get()
+    if profil is None:
+        yield
+    else:
+        with profil.etape(nom):
+            yield
+
+
+def compter_cache(nom, hits=0, misses=0):
+    profil = _profil_courant.get()
+    if profil is not None:
+        profil._cache(nom, hits, misses)
+
+
+def instrumenter_session(session, categorie):
+    """Ajoute à une requests.Session un hook qui compte les appels (méthode, statut, latence) du profil courant."""
+    def hook(resp, *args, **kwargs):
+        profil = _profil_courant.get()
+        if profil is not None:
+            profil._appel(categorie, resp.request.method, resp.status_code, resp.elapsed.total_seconds() * 1000)
+        return resp
+    session.hooks.setdefault("response", []).append(hook)
+    return session
+
+
+def configurer_log(dossier):
+    """Journal de performances : une ligne JSON par rerun, avec rotation."""
+    if not _logger.handlers:
+        os.makedirs(dossier, exist_ok=True)
+        handler = RotatingFileHandler(os.path.join(dossier, FICHIER_LOG_PERF), maxBytes=TAILLE_MAX_LOG, backupCount=3, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        _logger.addHandler(handler)
+        _logger.setLevel(logging.INFO)
+        _logger.propagate = False
+    return _logger
+
+
+def ecrire_profil(profil, interrompu=False):
+    """Écrit le profil dans le journal de performances (une seule fois)."""
+    if profil is None or profil.ecrit:
+        return
+    profil.ecrit = True
+    _logger.info(json.dumps(profil.resume(interrompu), ensure_ascii=False))
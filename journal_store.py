@@ -0,0 +1,243 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+from config import DOSSIER_DATA
+from instrumentation import compter_cache
+
+# --- CONFIGURATION DU STOCKAGE LOCAL ---
+FICHIER_JOURNAL = "journal.sqlite"
+# La dernière colonne porte la clé d'idempotence des lignes écrites par la file d'écriture
+COLONNES_JOURNAL = ['Date', 'Plot', 'Type', 'Montant', 'Note', 'Cle']
+
+INTERVALLE_SYNC_S = 15       # Délai minimum entre deux interrogations de Google Sheets
+INTERVALLE_COMPLET_S = 600   # Resynchronisation complète périodique (détection des modifications)
+
+
+def _lettre_colonne(n):
+    """Convertit un numéro de colonne (1 = A) en lettre(s) de colonne Sheets."""
+    lettres = ""
+    while n > 0:
+        n, reste = divmod(n - 1, 26)
+        lettres = chr(65 + reste) + lettres
+    return lettres
+
+
+def _numeriser(valeur):
+    """Même conversion que gspread.utils.numericise (valeurs par défaut), sans importer gspread."""
+    if not isinstance(valeur, str) or "_" in valeur:
+        return valeur
+    nettoyee = valeur.replace(",", "")
+    try: return int(nettoyee)
+    except ValueError: pass
+    try: return float(nettoyee)
+    except ValueError: return valeur
+
+
+def _normaliser_ligne(ligne, nb_colonnes):
+    """Complète/tronque une ligne brute de Sheets pour qu'elle ait exactement nb_colonnes cellules texte."""
+    ligne = ["" if v is None else str(v) for v in ligne[:nb_colonnes]]
+    return ligne + [""] * (nb_colonnes - len(ligne))
+
+
+def _encoder(lignes):
+    return [json.dumps(l, ensure_ascii=False) for l in lignes]
+
+
+def _chainer_checksum(checksum, lignes_json):
+    """Prolonge l'empreinte du journal avec de nouvelles lignes encodées (empreinte chaînée, compatible ajout)."""
+    for ligne in lignes_json:
+        checksum = hashlib.sha1((checksum + ligne).encode("utf-8")).hexdigest()
+    return checksum
+
+
+class JournalStore:
+    """Miroir local (SQLite) d'un onglet journal, synchronisé de façon incrémentale avec Google Sheets.
+
+    Seules les lignes ajoutées depuis le dernier nombre de lignes connu sont téléchargées ; la dernière
+    ligne connue sert d'ancre et toute divergence (modification, suppression) déclenche une resynchronisation
+    complète. Le fichier est partagé entre les reruns, les sessions et les processus.
+    """
+
+    def __init__(self, onglet, dossier=DOSSIER_DATA, colonnes=COLONNES_JOURNAL,
+                 intervalle_sync=INTERVALLE_SYNC_S, intervalle_complet=INTERVALLE_COMPLET_S):
+        os.makedirs(dossier, exist_ok=True)
+        self.onglet = onglet
+        self.colonnes = list(colonnes)
+        self.intervalle_sync = intervalle_sync
+        self.intervalle_complet = intervalle_complet
+        self.chemin = os.path.join(dossier, FICHIER_JOURNAL)
+        self._verrou = threading.RLock()
+        self._df = None
+        self._df_version = None
+        self._conn = sqlite3.connect(self.chemin, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS lignes (onglet TEXT NOT NULL, idx INTEGER NOT NULL, "
+            "valeurs TEXT NOT NULL, PRIMARY KEY (onglet, idx))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (onglet TEXT PRIMARY KEY, nb_lignes INTEGER NOT NULL, "
+            "checksum TEXT NOT NULL, version INTEGER NOT NULL, dernier_sync REAL NOT NULL, "
+            "dernier_complet REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    # --- MÉTADONNÉES ---
+    def _meta(self):
+        row = self._conn.execute(
+            "SELECT nb_lignes, checksum, version, dernier_sync, dernier_complet FROM meta WHERE onglet = ?",
+            (self.onglet,),
+        ).fetchone()
+        if row is None:
+            return {"nb_lignes": 0, "checksum": "", "version": 0, "dernier_sync": 0.0, "dernier_complet": 0.0}
+        return dict(zip(["nb_lignes", "checksum", "version", "dernier_sync", "dernier_complet"], row))
+
+    def _ecrire_meta(self, meta):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (onglet, nb_lignes, checksum, version, dernier_sync, dernier_complet) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (self.onglet, meta["nb_lignes"], meta["checksum"], meta["version"], meta["dernier_sync"], meta["dernier_complet"]),
+        )
+
+    def onglets_locaux(self):
+        """Onglets présents dans le miroir local (synchronisés au moins une fois)."""
+        with self._verrou:
+            return [r[0] for r in self._conn.execute("SELECT onglet FROM meta ORDER BY onglet").fetchall()]
+
+    @property
+    def version(self):
+        """Numéro de version du miroir, incrémenté à chaque changement de contenu."""
+        with self._verrou:
+            return self._meta()["version"]
+
+    @property
+    def nb_lignes(self):
+        with self._verrou:
+            return self._meta()["nb_lignes"]
+
+    @property
+    def checksum(self):
+        with self._verrou:
+            return self._meta()["checksum"]
+
+    # --- SYNCHRONISATION ---
+    def _plage(self, premiere_ligne):
+        return f"A{premiere_ligne}:{_lettre_colonne(len(self.colonnes))}"
+
+    def _derniere_ligne_locale(self, nb_lignes):
+        row = self._conn.execute(
+            "SELECT valeurs FROM lignes WHERE onglet = ? AND idx = ?", (self.onglet, nb_lignes - 1)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _resync_complet(self, worksheet, meta, maintenant):
+        """Retélécharge tout l'onglet ; ne change la version que si le contenu a réellement changé."""
+        valeurs = worksheet.get(self._plage(2))
+        lignes = _encoder(_normaliser_ligne(l, len(self.colonnes)) for l in valeurs)
+        checksum = _chainer_checksum("", lignes)
+        change = checksum != meta["checksum"] or len(lignes) != meta["nb_lignes"]
+        if change:
+            self._conn.execute("DELETE FROM lignes WHERE onglet = ?", (self.onglet,))
+            self._conn.executemany(
+                "INSERT INTO lignes (onglet, idx, valeurs) VALUES (?, ?, ?)",
+                [(self.onglet, i, l) for i, l in enumerate(lignes)],
+            )
+            meta["version"] += 1
+        meta.update(nb_lignes=len(lignes), checksum=checksum, dernier_sync=maintenant, dernier_complet=maintenant)
+        return change
+
+    def synchroniser(self, worksheet, force=False, complet=False):
+        """Met le miroir à jour depuis la feuille. Retourne True si le contenu local a changé.
+
+        force : ignore l'intervalle minimal entre deux synchronisations (ex : juste après une écriture).
+        complet : force un retéléchargement complet de l'onglet.
+        """
+        with self._verrou:
+            meta = self._meta()
+            maintenant = time.time()
+            if not force and not complet and maintenant - meta["dernier_sync"] < self.intervalle_sync:
+                return False
+
+            n = meta["nb_lignes"]
+            if complet or n == 0 or maintenant - meta["dernier_complet"] >= self.intervalle_complet:
+                change = self._resync_complet(worksheet, meta, maintenant)
+            else:
+                # Ligne d'en-tête = ligne 1, donc la dernière ligne connue est la ligne n + 1 de la feuille
+                valeurs = worksheet.get(self._plage(n + 1))
+                lignes = [_normaliser_ligne(l, len(self.colonnes)) for l in valeurs]
+                ancre = self._derniere_ligne_locale(n)
+                if not lignes or lignes[0] != ancre:
+                    # La feuille a été modifiée ou raccourcie : on repart de zéro
+                    change = self._resync_complet(worksheet, meta, maintenant)
+                else:
+                    nouvelles = _encoder(lignes[1:])
+                    change = bool(nouvelles)
+                    if change:
+                        self._conn.executemany(
+                            "INSERT INTO lignes (onglet, idx, valeurs) VALUES (?, ?, ?)",
+                            [(self.onglet, n + i, l) for i, l in enumerate(nouvelles)],
+                        )
+                        meta["nb_lignes"] = n + len(nouvelles)
+                        meta["checksum"] = _chainer_checksum(meta["checksum"], nouvelles)
+                        meta["version"] += 1
+                    meta["dernier_sync"] = maintenant
+            self._ecrire_meta(meta)
+            self._conn.commit()
+            return change
+
+    # --- LECTURE ---
+    def _lignes_json(self, depuis=0):
+        with self._verrou:
+            rows = self._conn.execute(
+                "SELECT valeurs FROM lignes WHERE onglet = ? AND idx >= ? ORDER BY idx", (self.onglet, depuis)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def lignes(self, depuis=0):
+        """Lignes brutes (listes de textes) à partir de l'index `depuis`."""
+        return [json.loads(l) for l in self._lignes_json(depuis)]
+
+    def lignes_ajoutees(self, nb_lignes, checksum):
+        """Lignes ajoutées depuis l'état (nb_lignes, checksum) d'un consommateur.
+
+        Retourne (nouvelles_lignes, nb_lignes_actuel, checksum_actuel), ou (None, ...) si le journal a été
+        réécrit depuis (l'empreinte chaînée ne prolonge plus celle du consommateur) : il faut alors tout recharger.
+        """
+        with self._verrou:
+            meta = self._meta()
+            if nb_lignes > meta["nb_lignes"]:
+                return None, meta["nb_lignes"], meta["checksum"]
+            nouvelles = self._lignes_json(depuis=nb_lignes)
+            # Depuis un état vide, l'empreinte du miroir prolonge par construction celle du consommateur
+            if nb_lignes and _chainer_checksum(checksum, nouvelles) != meta["checksum"]:
+                return None, meta["nb_lignes"], meta["checksum"]
+            return [json.loads(l) for l in nouvelles], meta["nb_lignes"], meta["checksum"]
+
+    def instantane(self):
+        """(DataFrame, nb_lignes, checksum) cohérents entre eux, lus sous le même verrou."""
+        with self._verrou:
+            meta = self._meta()
+            return self.charger(), meta["nb_lignes"], meta["checksum"]
+
+    def charger(self):
+        """Journal complet sous forme de DataFrame (mêmes colonnes et types que get_all_records).
+
+        Le DataFrame est mis en cache en mémoire par version ; l'appelant reçoit une copie légère
+        à laquelle il peut ajouter des colonnes sans toucher au cache partagé.
+        """
+        with self._verrou:
+            version = self._meta()["version"]
+            a_jour = self._df is not None and self._df_version == version
+            compter_cache(f"miroir {self.onglet}", hits=int(a_jour), misses=int(not a_jour))
+            if not a_jour:
+                # Import différé : la CLI n'en paie le coût que si elle lit le journal
+                import pandas as pd
+                df = pd.DataFrame(self.lignes(), columns=self.colonnes)
+                if 'Montant' in df.columns:
+                    df['Montant'] = df['Montant'].map(_numeriser)
+                self._df, self._df_version = df, version
+            return self._df.copy(deep=False)
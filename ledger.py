@@ -0,0 +1,462 @@
+import re
+import threading
+from functools import lru_cache
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# --- MOTEUR DE CALCUL DU JOURNAL ---
+CIBLES_DIVERSES = ["Taxe Guilde", "Autre"]
+TYPE_RESUME = "Résumé archive"   # Ligne de synthèse d'un plot archivé : signe 0, ne compte pas dans les totaux
+
+
+@lru_cache(maxsize=None)
+def get_typology(name):
+    if name in CIBLES_DIVERSES: return "DIVERS"
+    base = re.sub(r'[\d\s]+$', '', str(name)).strip().upper()
+    return base if base else "INCONNU"
+
+
+def signe_type(type_op):
+    """-1 pour une dépense, +1 pour une recette, 0 sinon (clôture, résumé, etc.)."""
+    t = str(type_op).lower()
+    if "dépense" in t: return -1
+    if "recette" in t: return 1
+    return 0
+
+
+def _categorie(serie):
+    return serie.astype(str).astype('category')
+
+
+def _parser_dates(dates, annee_defaut):
+    """Parse une colonne catégorielle de dates : chaque valeur distincte n'est analysée qu'une fois.
+
+    Format attendu jj/mm/aaaa, avec repli sur jj/mm (année par défaut) pour les saisies sans année.
+    """
+    uniques = pd.Series(dates.cat.categories)
+    parses = pd.to_datetime(uniques, format='%d/%m/%Y', errors='coerce')
+    manquants = parses.isna()
+    if manquants.any():
+        parses[manquants] = pd.to_datetime(uniques[manquants] + f"/{annee_defaut}", format='%d/%m/%Y', errors='coerce')
+    codes = dates.cat.codes.to_numpy()
+    valeurs = parses.to_numpy(dtype='datetime64[ns]')[codes]
+    valeurs[codes < 0] = np.datetime64('NaT')
+    return valeurs
+
+
+def preparer_journal(df, annee_defaut=None):
+    """Construit le journal de calcul à partir des lignes brutes (Date, Plot, Type, Montant, Note).
+
+    Colonnes produites : Date (texte d'origine), Date_Obj (datetime64), Plot/Type/Famille (catégories),
+    Montant et Reel (int64, Reel étant signé selon le Type), Note.
+    """
+    annee_defaut = annee_defaut or datetime.now().year
+    dates = _categorie(df['Date'])
+    plots = _categorie(df['Plot'])
+    types = _categorie(df['Type'])
+    montants = pd.to_numeric(df['Montant'], errors='coerce').fillna(0).round().astype('int64').to_numpy()
+
+    # Signe et famille calculés une seule fois par valeur distincte, puis diffusés via les codes
+    signes = np.array([signe_type(t) for t in types.cat.categories] + [0], dtype='int64')
+    familles_plot = [get_typology(p) for p in plots.cat.categories]
+    categories_familles = sorted(set(familles_plot))
+    position = {f: i for i, f in enumerate(categories_familles)}
+    codes_familles = np.array([position[f] for f in familles_plot] + [-1], dtype='int64')
+
+    return pd.DataFrame({
+        'Date': df['Date'].to_numpy(),
+        'Date_Obj': _parser_dates(dates, annee_defaut),
+        'Plot': plots,
+        'Type': types,
+        'Famille': pd.Categorical.from_codes(codes_familles[plots.cat.codes.to_numpy()], categories=categories_familles),
+        'Montant': montants,
+        'Reel': montants * signes[types.cat.codes.to_numpy()],
+        'Note': df['Note'].to_numpy(),
+    }, index=df.index)
+
+
+def filtrer_periode(journal, debut, fin):
+    """Lignes dont la date est comprise entre debut et fin inclus (les dates illisibles sont exclues)."""
+    dates = journal['Date_Obj'].to_numpy()
+    mask = (dates >= np.datetime64(pd.Timestamp(debut))) & (dates < np.datetime64(pd.Timestamp(fin) + timedelta(days=1)))
+    return journal[mask]
+
+
+def totaux(journal):
+    """Trésorerie nette, recettes et dépenses d'un journal préparé."""
+    reel = journal['Reel'].to_numpy()
+    return {
+        "total": int(reel.sum()),
+        "recettes": int(reel[reel > 0].sum()),
+        "depenses": int(reel[reel < 0].sum()),
+    }
+
+
+def bilan_familles(journal, tous_les_plots):
+    """Net par famille sur le journal fourni.
+
+    Toutes les familles des plots connus (actifs et clôturés) apparaissent, même à 0, ainsi que DIVERS.
+    Seules les lignes rattachées à un plot connu ou à une cible diverse sont comptées.
+    """
+    totaux_familles = {get_typology(p): 0 for p in tous_les_plots}
+    totaux_familles["DIVERS"] = 0
+    if not journal.empty:
+        autorises = journal['Plot'].isin(list(tous_les_plots) + CIBLES_DIVERSES).to_numpy()
+        stats = journal.loc[autorises].groupby('Famille', observed=True)['Reel'].sum()
+        for fam, val in stats.items():
+            totaux_familles[fam] = totaux_familles.get(fam, 0) + int(val)
+    return totaux_familles
+
+
+def rapport(journal, debut=None, fin=None, par="total"):
+    """Synthèse de la période sous forme de lignes (dictionnaires) prêtes pour CSV / JSON.
+
+    par : "total", "family" (mêmes familles que les cartes de l'onglet Trésorerie), "plot" ou "day".
+    """
+    dates = journal['Date_Obj'].dropna()
+    debut = debut or (dates.min().date() if not dates.empty else datetime.today().date())
+    fin = fin or datetime.today().date()
+    periode = filtrer_periode(journal, debut, fin)
+    if par == "total":
+        return [{"debut": str(debut), "fin": str(fin), **totaux(periode)}]
+
+    cles = {"family": "Famille", "plot": "Plot", "day": "Jour"}
+    if par not in cles:
+        raise ValueError(f"Regroupement inconnu : {par}")
+    if par == "day":
+        periode = periode.assign(Jour=periode['Date_Obj'].dt.strftime("%Y-%m-%d"))
+    else:
+        # Comme dans l'application : seules les lignes rattachées à un plot nommé comptent
+        periode = periode[periode['Plot'].astype(str).str.strip() != ""]
+    reel = periode['Reel']
+    groupes = periode.assign(recettes=reel.where(reel > 0, 0), depenses=reel.where(reel < 0, 0)) \
+        .groupby(cles[par], observed=True)[['recettes', 'depenses']].sum()
+
+    if par == "family":
+        tous_les_plots = [p for p in journal['Plot'].unique() if str(p).strip() not in [""] + CIBLES_DIVERSES]
+        familles = sorted({get_typology(p) for p in tous_les_plots} | {"DIVERS"} | set(groupes.index))
+        groupes = groupes.reindex(familles, fill_value=0)
+    return [
+        {cles[par].lower(): str(nom), "recettes": int(l.recettes), "depenses": int(l.depenses), "net": int(l.recettes + l.depenses)}
+        for nom, l in groupes.sort_index().iterrows()
+    ]
+
+
+# --- INDEX D'AGRÉGATS PAR JOUR ---
+class IndexAgregats:
+    """Agrégats quotidiens par plot (recettes / dépenses) stockés en sommes cumulées.
+
+    Le total d'une période, pour n'importe quelle série (global, plot, famille), se lit avec deux
+    accès aux sommes cumulées au lieu d'un parcours du journal. Les nouvelles lignes du journal sont
+    intégrées incrémentalement via synchroniser().
+    """
+
+    def __init__(self):
+        self._verrou = threading.RLock()
+        self.jours = np.array([], dtype='datetime64[D]')
+        self.plots = []
+        self._col_plot = {}
+        # cum[k, c] = somme des jours[:k] pour le plot c (ligne 0 = zéro)
+        self.cum_recettes = np.zeros((1, 0), dtype='int64')
+        self.cum_depenses = np.zeros((1, 0), dtype='int64')
+        self.nb_lignes = 0
+        self.checksum = ""
+        self.annee_defaut = None
+
+    # --- CONSTRUCTION ---
+    def _colonnes(self, plots):
+        """Codes colonne des plots, en créant les colonnes manquantes."""
+        nouveaux = [p for p in dict.fromkeys(plots) if p not in self._col_plot]
+        if nouveaux:
+            for p in nouveaux:
+                self._col_plot[p] = len(self.plots)
+                self.plots.append(p)
+            vide = np.zeros((self.cum_recettes.shape[0], len(nouveaux)), dtype='int64')
+            self.cum_recettes = np.hstack([self.cum_recettes, vide])
+            self.cum_depenses = np.hstack([self.cum_depenses, vide])
+        return np.array([self._col_plot[p] for p in plots], dtype='int64')
+
+    def ajouter(self, journal):
+        """Intègre des lignes préparées (preparer_journal) dans l'index."""
+        with self._verrou:
+            journal = journal[journal['Date_Obj'].notna().to_numpy()]
+            if journal.empty:
+                return
+            jours = journal['Date_Obj'].to_numpy().astype('datetime64[D]')
+            reel = journal['Reel'].to_numpy()
+            cols = self._colonnes(journal['Plot'].astype(str).tolist())
+
+            # Insertion des jours absents en une fois : un nouveau jour reprend la somme cumulée de la veille
+            manquants = np.setdiff1d(np.unique(jours), self.jours)
+            if len(manquants):
+                tous_jours = np.union1d(self.jours, manquants)
+                anciennes = np.concatenate([[0], np.searchsorted(self.jours, tous_jours, side='right')])
+                self.jours = tous_jours
+                self.cum_recettes = self.cum_recettes[anciennes]
+                self.cum_depenses = self.cum_depenses[anciennes]
+
+            # Report des montants sur les sommes cumulées à partir de leur jour
+            positions = np.searchsorted(self.jours, jours) + 1
+            debut = int(positions.min())
+            for cum, valeurs in ((self.cum_recettes, np.where(reel > 0, reel, 0)), (self.cum_depenses, np.where(reel < 0, reel, 0))):
+                delta = np.zeros((cum.shape[0] - debut, cum.shape[1]), dtype='int64')
+                np.add.at(delta, (positions - debut, cols), valeurs)
+                cum[debut:] += np.cumsum(delta, axis=0)
+
+    def reconstruire(self, journal):
+        with self._verrou:
+            self.__init__()
+            self.ajouter(journal)
+
+    def synchroniser(self, store, annee_defaut=None):
+        """Met l'index à jour depuis un JournalStore : ajout incrémental, reconstruction si le journal a été réécrit."""
+        annee_defaut = annee_defaut or datetime.now().year
+        with self._verrou:
+            if annee_defaut == self.annee_defaut and self.nb_lignes:
+                nouvelles, nb_lignes, checksum = store.lignes_ajoutees(self.nb_lignes, self.checksum)
+                if nouvelles is not None:
+                    if nouvelles:
+                        self.ajouter(preparer_journal(pd.DataFrame(nouvelles, columns=store.colonnes), annee_defaut))
+                    self.nb_lignes, self.checksum = nb_lignes, checksum
+                    return
+            brut, nb_lignes, checksum = store.instantane()
+            self.reconstruire(preparer_journal(brut, annee_defaut))
+            self.nb_lignes, self.checksum, self.annee_defaut = nb_lignes, checksum, annee_defaut
+
+    # --- REQUÊTES ---
+    def _bornes(self, debut, fin):
+        lo = int(np.searchsorted(self.jours, np.datetime64(pd.Timestamp(debut), 'D'), side='left'))
+        hi = int(np.searchsorted(self.jours, np.datetime64(pd.Timestamp(fin), 'D'), side='right'))
+        return lo, max(lo, hi)
+
+    def par_plot(self, debut, fin):
+        """(recettes, dépenses) de la période, par plot (vecteurs alignés sur self.plots)."""
+        with self._verrou:
+            lo, hi = self._bornes(debut, fin)
+            return self.cum_recettes[hi] - self.cum_recettes[lo], self.cum_depenses[hi] - self.cum_depenses[lo]
+
+    def totaux(self, debut, fin, en_attente=None):
+        """Même résultat que totaux(filtrer_periode(journal, debut, fin)).
+
+        en_attente : lignes préparées pas encore présentes dans le journal (file d'écriture), ajoutées au résultat.
+        """
+        recettes, depenses = self.par_plot(debut, fin)
+        resultat = {
+            "total": int(recettes.sum() + depenses.sum()),
+            "recettes": int(recettes.sum()),
+            "depenses": int(depenses.sum()),
+        }
+        if en_attente is not None and not en_attente.empty:
+            for cle, val in totaux(filtrer_periode(en_attente, debut, fin)).items():
+                resultat[cle] += val
+        return resultat
+
+    def bilan_familles(self, debut, fin, tous_les_plots, en_attente=None):
+        """Même résultat que bilan_familles(filtrer_periode(journal, debut, fin), tous_les_plots)."""
+        if en_attente is not None and not en_attente.empty:
+            totaux_familles = bilan_familles(filtrer_periode(en_attente, debut, fin), tous_les_plots)
+        else:
+            totaux_familles = {get_typology(p): 0 for p in tous_les_plots}
+            totaux_familles["DIVERS"] = 0
+        autorises = set(tous_les_plots) | set(CIBLES_DIVERSES)
+        recettes, depenses = self.par_plot(debut, fin)
+        for plot, net in zip(self.plots, recettes + depenses):
+            if plot in autorises:
+                fam = get_typology(plot)
+                totaux_familles[fam] = totaux_familles.get(fam, 0) + int(net)
+        return totaux_familles
+
+
+# --- REGISTRE DES PLOTS ---
+# Réduction de chaque colonne du registre : deux agrégats partiels se fusionnent avec les mêmes réducteurs
+_REDUCTEURS_PLOTS = {
+    "Net": "sum", "Nb": "sum", "Rang": "min", "Premiere": "min", "Derniere": "max",
+    "Ouverture": "min", "Cout": "sum", "Cloture": "max", "Revente": "sum", "Clos": "max", "Cloture_archivee": "max",
+}
+
+
+def _agreger_plots(journal, rang=0):
+    """Agrégat par plot d'un journal préparé, en un seul groupby.
+
+    Ouverture : lignes de note « Ouverture » ; clôture : type ou note « Clôture ». Les lignes de résumé
+    d'archive apportent leur montant (net des lignes archivées) au net, pas aux dates d'activité. Une ligne
+    de clôture sans date lisible clôt tout de même le plot (Clos), seule sa date reste inconnue.
+    """
+    types = journal['Type'].astype(str).to_numpy()
+    notes = journal['Note'].astype(str).to_numpy()
+    resume = types == TYPE_RESUME
+    ouverture = (notes == 'Ouverture') & ~resume
+    cloture = ((types == 'Clôture') | (notes == 'Clôture')) & ~resume
+    dates = journal['Date_Obj'].to_numpy()
+    nat = np.datetime64('NaT', 'ns')
+    montants = journal['Montant'].to_numpy()
+    agregat = pd.DataFrame({
+        'Plot': journal['Plot'].astype(str).to_numpy(),
+        'Net': np.where(resume, montants, journal['Reel'].to_numpy()),
+        'Nb': (~resume).astype('int64'),
+        'Rang': np.arange(rang, rang + len(journal)),
+        'Premiere': np.where(resume, nat, dates),
+        'Derniere': np.where(resume, nat, dates),
+        'Ouverture': np.where(ouverture, dates, nat),
+        'Cout': np.where(ouverture, montants, 0),
+        'Cloture': np.where(cloture, dates, nat),
+        'Revente': np.where(cloture, montants, 0),
+        'Clos': cloture,
+        'Cloture_archivee': resume & (notes == 'Clôture'),
+    }).groupby('Plot', sort=False).agg(_REDUCTEURS_PLOTS)
+    return agregat
+
+
+def _fusionner_plots(*agregats):
+    agregats = [a for a in agregats if a is not None and not a.empty]
+    if len(agregats) < 2:
+        return agregats[0] if agregats else None
+    return pd.concat(agregats).groupby(level=0, sort=False).agg(_REDUCTEURS_PLOTS)
+
+
+class RegistrePlots:
+    """Registre des plots : ouverture (date, coût), clôture (date, revente), net cumulé et famille.
+
+    Construit en un groupby puis tenu à jour incrémentalement depuis le JournalStore, comme IndexAgregats.
+    Les lignes archivées n'apportent que les dates et montants d'ouverture / clôture (integrer_archive),
+    leur net étant déjà porté par les lignes de résumé de l'onglet actif.
+    """
+
+    def __init__(self):
+        self._verrou = threading.RLock()
+        self._base = None
+        self._archives = {}     # onglet d'archive -> (version, agrégat sans le net)
+        self._fiches = None
+        self.nb_lignes = 0
+        self.checksum = ""
+        self.annee_defaut = None
+
+    def synchroniser(self, store, annee_defaut=None):
+        """Met le registre à jour depuis un JournalStore (ajout incrémental, reconstruction si réécrit)."""
+        annee_defaut = annee_defaut or datetime.now().year
+        with self._verrou:
+            if annee_defaut == self.annee_defaut and self.nb_lignes:
+                nouvelles, nb_lignes, checksum = store.lignes_ajoutees(self.nb_lignes, self.checksum)
+                if nouvelles is not None:
+                    if nouvelles:
+                        journal = preparer_journal(pd.DataFrame(nouvelles, columns=store.colonnes), annee_defaut)
+                        self._base = _fusionner_plots(self._base, _agreger_plots(journal, rang=self.nb_lignes))
+                        self._fiches = None
+                    self.nb_lignes, self.checksum = nb_lignes, checksum
+                    return
+            brut, nb_lignes, checksum = store.instantane()
+            self._base = _agreger_plots(preparer_journal(brut, annee_defaut)) if nb_lignes else None
+            self._fiches = None
+            self.nb_lignes, self.checksum, self.annee_defaut = nb_lignes, checksum, annee_defaut
+
+    def integrer_archive(self, nom, store):
+        """Ajoute les ouvertures / clôtures d'un onglet d'archive chargé (sans effet si déjà intégré)."""
+        with self._verrou:
+            version = store.version
+            if nom in self._archives and self._archives[nom][0] == version:
+                return
+            agregat = _agreger_plots(preparer_journal(store.charger())) if store.nb_lignes else None
+            if agregat is not None:
+                agregat['Net'] = 0
+                agregat['Rang'] = np.iinfo('int64').max
+            self._archives[nom] = (version, agregat)
+            self._fiches = None
+
+    def fiches(self, en_attente=None):
+        """{plot: fiche} dans l'ordre d'apparition, lignes en attente d'envoi comprises."""
+        with self._verrou:
+            if self._fiches is None:
+                self._fiches = self._construire(_fusionner_plots(self._base, *(a for _, a in self._archives.values())))
+            if en_attente is None or en_attente.empty:
+                return self._fiches
+            agregat = _fusionner_plots(self._base, *(a for _, a in self._archives.values()),
+                                       _agreger_plots(en_attente, rang=self.nb_lignes))
+            return self._construire(agregat)
+
+    @staticmethod
+    def _construire(agregat):
+        if agregat is None:
+            return {}
+        def jour(valeur):
+            return None if pd.isna(valeur) else valeur.date()
+        fiches = {}
+        for plot, l in agregat.sort_values('Rang', kind='stable').to_dict('index').items():
+            fiches[plot] = {
+                "Famille": get_typology(plot),
+                "Suivi": plot.strip() not in [""] + CIBLES_DIVERSES,
+                "Clos": bool(l['Clos']) or bool(l['Cloture_archivee']),
+                "Ouverture": jour(l['Ouverture']), "Cout": int(l['Cout']),
+                "Cloture": jour(l['Cloture']), "Revente": int(l['Revente']),
+                "Premiere": jour(l['Premiere']), "Derniere": jour(l['Derniere']),
+                "Net": int(l['Net']), "Nb": int(l['Nb']),
+            }
+        return fiches
+
+
+# --- INDEX DE L'HISTORIQUE ---
+TRIS_HISTORIQUE = ("Date", "Plot", "Montant")
+
+
+class IndexHistorique:
+    """Ordres de tri pré-calculés du journal préparé, pour paginer l'historique côté serveur.
+
+    Les ordres (date, plot, montant) ne sont recalculés que lorsque le journal change ; une page se lit
+    ensuite par simple découpage, ou après un masque vectorisé quand des filtres sont actifs. Seules les
+    lignes de la page sont extraites du journal.
+    """
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self.cle = None
+        self.journal = None
+        self._dates = None
+        self._ordres = {}
+        self._dates_triees = None
+
+    def synchroniser(self, journal, cle):
+        """Recalcule les ordres si `cle` (version du journal + lignes en attente) a changé."""
+        with self._verrou:
+            if cle == self.cle:
+                return
+            dates = journal['Date_Obj'].to_numpy()
+            # Tris stables : à valeur égale, l'ordre de saisie est conservé ; les dates illisibles finissent en queue
+            ordre_date = np.argsort(dates, kind='stable')
+            self._ordres = {
+                "Date": ordre_date,
+                "Plot": ordre_date[np.argsort(journal['Plot'].cat.codes.to_numpy()[ordre_date], kind='stable')],
+                "Montant": ordre_date[np.argsort(journal['Montant'].to_numpy()[ordre_date], kind='stable')],
+            }
+            self._dates = dates
+            self._dates_triees = dates[ordre_date]
+            self.journal, self.cle = journal, cle
+
+    def selectionner(self, debut, fin, tri="Date", descendant=True, plots=None, familles=None, types=None):
+        """Positions (dans le journal indexé) des lignes de la période, filtrées et triées."""
+        with self._verrou:
+            if self.journal is None:
+                return np.array([], dtype='int64')
+            borne_debut = np.datetime64(pd.Timestamp(debut))
+            borne_fin = np.datetime64(pd.Timestamp(fin) + timedelta(days=1))
+            if tri == "Date":
+                # Période contiguë dans l'ordre des dates : deux recherches dichotomiques
+                lo = np.searchsorted(self._dates_triees, borne_debut, side='left')
+                hi = np.searchsorted(self._dates_triees, borne_fin, side='left')
+                positions = self._ordres["Date"][lo:max(lo, hi)]
+            else:
+                ordre = self._ordres[tri]
+                dates = self._dates[ordre]
+                positions = ordre[(dates >= borne_debut) & (dates < borne_fin)]
+            for colonne, valeurs in (('Plot', plots), ('Famille', familles), ('Type', types)):
+                if valeurs:
+                    serie = self.journal[colonne]
+                    codes = [serie.cat.categories.get_loc(v) for v in valeurs if v in serie.cat.categories]
+                    positions = positions[np.isin(serie.cat.codes.to_numpy()[positions], codes)]
+            return positions[::-1] if descendant else positions
+
+    def lignes(self, positions, colonnes=None):
+        """Extrait du journal indexé les lignes aux positions données (typiquement une page)."""
+        with self._verrou:
+            page = self.journal.iloc[positions]
+            return page if colonnes is None else page[colonnes]
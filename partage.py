@@ -0,0 +1,88 @@
+import threading
+from collections import OrderedDict
+
+from instrumentation import compter_cache
+
+# --- CALCULS PARTAGÉS ENTRE SESSIONS ---
+TAILLE_CACHE_PARTAGE = 8
+
+
+class _Appel:
+    __slots__ = ("fait", "resultat", "erreur")
+
+    def __init__(self):
+        self.fait = threading.Event()
+        self.resultat = None
+        self.erreur = None
+
+
+class VolUnique:
+    """Fusion des appels concurrents identiques (« single flight »).
+
+    Le premier appelant d'une clé exécute la fonction ; ceux qui arrivent pendant le calcul attendent et
+    reçoivent le même résultat (ou la même exception). Rien n'est conservé une fois l'appel terminé.
+    """
+
+    def __init__(self, nom="partage"):
+        self.nom = nom
+        self._verrou = threading.Lock()
+        self._en_vol = {}
+
+    def executer(self, cle, fonction):
+        with self._verrou:
+            appel = self._en_vol.get(cle)
+            meneur = appel is None
+            if meneur:
+                appel = self._en_vol[cle] = _Appel()
+        if not meneur:
+            compter_cache(self.nom, hits=1)
+            appel.fait.wait()
+            if appel.erreur is not None:
+                raise appel.erreur
+            return appel.resultat
+        compter_cache(self.nom, misses=1)
+        try:
+            appel.resultat = fonction()
+            return appel.resultat
+        except BaseException as e:
+            appel.erreur = e
+            raise
+        finally:
+            with self._verrou:
+                del self._en_vol[cle]
+            appel.fait.set()
+
+
+class CachePartage(VolUnique):
+    """Résultats dérivés (DataFrames, index) partagés par toutes les sessions, par clé de version.
+
+    Les derniers résultats restent en mémoire (LRU) ; un résultat manquant est calculé une seule fois même
+    si plusieurs sessions le demandent en même temps. Les objets rendus sont partagés : ils se lisent sans
+    se modifier (avec le copy-on-write de pandas, une modification faite par une session reste locale).
+    """
+
+    def __init__(self, nom="partage", taille=TAILLE_CACHE_PARTAGE):
+        super().__init__(nom)
+        self.taille = taille
+        self._resultats = OrderedDict()
+        self._verrou_cache = threading.Lock()
+
+    def obtenir(self, cle, fonction):
+        with self._verrou_cache:
+            if cle in self._resultats:
+                self._resultats.move_to_end(cle)
+                compter_cache(self.nom, hits=1)
+                return self._resultats[cle]
+
+        def calculer():
+            # Un autre appelant a pu terminer le même calcul entre-temps
+            with self._verrou_cache:
+                if cle in self._resultats:
+                    return self._resultats[cle]
+            resultat = fonction()
+            with self._verrou_cache:
+                self._resultats[cle] = resultat
+                while len(self._resultats) > self.taille:
+                    self._resultats.popitem(last=False)
+            return resultat
+        return self.executer(cle, calculer)
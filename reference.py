@@ -0,0 +1,121 @@
+import time
+import threading
+from datetime import datetime
+
+from gspread.utils import rowcol_to_a1
+
+from instrumentation import compter_cache
+
+# --- RÉFÉRENCE DES CRAFTEURS ---
+COLONNES_REFERENCE = ['Pseudo', 'Guilde', 'Alliance', 'Ajouté le', 'Statut']
+STATUT_ACTIF = "Actif"
+STATUT_PARTI = "Parti"
+DUREE_VALIDITE_S = 300   # Relecture périodique pour prendre en compte les modifications faites à la main
+
+
+class IndexReference:
+    """Index en mémoire de l'onglet de référence : pseudo (minuscules) -> (ligne, statut).
+
+    L'onglet n'est relu qu'à l'expiration de l'index ou après invalidation ; la sauvegarde d'un scan
+    met l'index à jour directement, sans relecture.
+    """
+
+    def __init__(self, duree_validite=DUREE_VALIDITE_S):
+        self.duree_validite = duree_validite
+        self.version = 0
+        self._verrou = threading.RLock()
+        self._charge_le = 0.0
+        self._entete = []
+        self._lignes = {}       # pseudo minuscule -> (numéro de ligne Sheets, statut)
+        self._nb_lignes = 1     # Dernière ligne occupée (1 = en-tête seul)
+
+    def invalider(self):
+        with self._verrou:
+            self._charge_le = 0.0
+
+    def charger(self, ws_ref, force=False):
+        """Relit l'onglet si l'index a expiré (ou si force=True)."""
+        with self._verrou:
+            if not force and time.time() - self._charge_le < self.duree_validite:
+                compter_cache("reference", hits=1)
+                return
+            compter_cache("reference", misses=1)
+            valeurs = ws_ref.get_all_values()
+            entete = [str(v).strip() for v in valeurs[0]] if valeurs else []
+            colonnes = {c.lower(): i for i, c in enumerate(entete)}
+            i_pseudo, i_statut = colonnes.get('pseudo'), colonnes.get('statut')
+            lignes = {}
+            if i_pseudo is not None:
+                for num, ligne in enumerate(valeurs[1:], start=2):
+                    pseudo = str(ligne[i_pseudo]).strip().lower() if i_pseudo < len(ligne) else ""
+                    if not pseudo:
+                        continue
+                    statut = ligne[i_statut].strip() if i_statut is not None and i_statut < len(ligne) else ""
+                    lignes[pseudo] = (num, statut or STATUT_ACTIF)
+            if lignes != self._lignes or entete != self._entete:
+                self.version += 1
+            self._entete, self._lignes, self._nb_lignes = entete, lignes, max(len(valeurs), 1)
+            self._charge_le = time.time()
+
+    def est_connu(self, pseudo):
+        """Vrai si le pseudo est un membre actif de la référence (recherche O(1))."""
+        entree = self._lignes.get(str(pseudo).lower())
+        return entree is not None and entree[1] != STATUT_PARTI
+
+    def sauvegarder(self, ws_ref, joueurs):
+        """Fait de `joueurs` (fiches du scanner) la nouvelle référence, par différence avec l'existant.
+
+        Les nouveaux pseudos sont ajoutés en un seul append_rows ; les départs (et les retours) ne changent
+        que la cellule Statut, en un seul batch_update. Retourne les compteurs de la mise à jour.
+        """
+        with self._verrou:
+            self.charger(ws_ref, force=True)
+            entete = list(self._entete)
+            maj = []
+            manquantes = [c for c in COLONNES_REFERENCE if c.lower() not in {e.lower() for e in entete}]
+            if manquantes:
+                entete += manquantes
+                maj.append({'range': f"A1:{rowcol_to_a1(1, len(entete))}", 'values': [entete]})
+            colonnes = {c.lower(): i for i, c in enumerate(entete)}
+            col_statut = colonnes['statut'] + 1
+
+            scannes = {}
+            for j in joueurs:
+                pseudo = str(j.get('Pseudo') or "").strip()
+                if pseudo: scannes.setdefault(pseudo.lower(), j)
+
+            nouvelles, reactives, partis = [], [], []
+            for cle, j in scannes.items():
+                entree = self._lignes.get(cle)
+                if entree is None:
+                    ligne = [""] * len(entete)
+                    valeurs = {
+                        'pseudo': j.get('Pseudo'), 'guilde': j.get('Guilde', ""), 'alliance': j.get('Alliance', ""),
+                        'ajouté le': datetime.now().strftime("%d/%m/%Y"), 'statut': STATUT_ACTIF,
+                    }
+                    for nom, val in valeurs.items():
+                        ligne[colonnes[nom]] = "" if val is None else val
+                    nouvelles.append((cle, ligne))
+                elif entree[1] == STATUT_PARTI:
+                    reactives.append(cle)
+                    maj.append({'range': rowcol_to_a1(entree[0], col_statut), 'values': [[STATUT_ACTIF]]})
+            for cle, (num, statut) in self._lignes.items():
+                if cle not in scannes and statut != STATUT_PARTI:
+                    partis.append(cle)
+                    maj.append({'range': rowcol_to_a1(num, col_statut), 'values': [[STATUT_PARTI]]})
+
+            if maj:
+                ws_ref.batch_update(maj)
+            if nouvelles:
+                ws_ref.append_rows([ligne for _, ligne in nouvelles], table_range="A1")
+
+            # Mise à jour locale de l'index, sans relecture de l'onglet
+            for cle in reactives: self._lignes[cle] = (self._lignes[cle][0], STATUT_ACTIF)
+            for cle in partis: self._lignes[cle] = (self._lignes[cle][0], STATUT_PARTI)
+            for num, (cle, _) in enumerate(nouvelles, start=self._nb_lignes + 1):
+                self._lignes[cle] = (num, STATUT_ACTIF)
+            self._nb_lignes += len(nouvelles)
+            self._entete = entete
+            if maj or nouvelles:
+                self.version += 1
+            return {"ajoutes": len(nouvelles), "reactives": len(reactives), "partis": len(partis)}
@@ -0,0 +1,60 @@
+import io
+import re
+from collections import Counter
+
+# --- ANALYSE DES EXPORTS DE PERMISSIONS ---
+TYPES_PRINCIPAUX = ("Player", "Guild", "Alliance")
+MOTIF_PRINCIPAL = re.compile(r'"(' + "|".join(TYPES_PRINCIPAUX) + r'):([^"]+)"')
+TAILLE_BLOC = 64 * 1024
+RESTE_MAX = 4096   # Aucun nom valide n'est aussi long : au-delà, le reste d'un bloc est abandonné
+
+
+class ResultatExport:
+    """Entrées d'un export : occurrences par type (clé en minuscules) et noms distincts dans l'ordre d'apparition."""
+
+    def __init__(self):
+        self.occurrences = {t: Counter() for t in TYPES_PRINCIPAUX}
+        self.noms = {t: {} for t in TYPES_PRINCIPAUX}
+
+    def _ajouter(self, type_principal, nom):
+        self.occurrences[type_principal][nom.lower()] += 1
+        self.noms[type_principal].setdefault(nom, None)
+
+    @property
+    def joueurs(self):
+        return list(self.noms["Player"])
+
+
+def analyser_export(flux, taille_bloc=TAILLE_BLOC):
+    """Parcourt un export (flux texte ou binaire UTF-8) bloc par bloc, en une seule passe et mémoire bornée.
+
+    Équivalent à re.findall(MOTIF_PRINCIPAL, texte_complet) : une entrée coupée entre deux blocs est
+    reprise au bloc suivant à partir de son guillemet ouvrant.
+    """
+    binaire = not isinstance(flux, (str, io.TextIOBase))
+    if isinstance(flux, str):
+        flux = io.StringIO(flux)
+    elif binaire:
+        flux = io.TextIOWrapper(flux, encoding="utf-8", errors="replace")
+
+    resultat = ResultatExport()
+    reste = ""
+    try:
+        while True:
+            bloc = flux.read(taille_bloc)
+            if not bloc:
+                break
+            tampon = reste + bloc
+            fin_derniere = 0
+            for m in MOTIF_PRINCIPAL.finditer(tampon):
+                resultat._ajouter(m.group(1), m.group(2))
+                fin_derniere = m.end()
+            # Seule une entrée ouverte par le dernier guillemet peut encore se compléter avec le bloc suivant
+            dernier_guillemet = tampon.rfind('"', fin_derniere)
+            reste = tampon[dernier_guillemet:] if dernier_guillemet >= 0 else ""
+            if len(reste) > RESTE_MAX:
+                reste = ""
+    finally:
+        # Le flux binaire appartient à l'appelant (ex : fichier importé) : on ne le ferme pas
+        if binaire: flux.detach()
+    return resultat
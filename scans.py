@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+import contextvars
+
+from config import DOSSIER_DATA
+from instrumentation import demarrer_profil, ecrire_profil, etape
+
+# --- TÂCHES DE SCAN EN ARRIÈRE-PLAN ---
+FICHIER_SCANS = "scans.sqlite"
+DUREE_CONSERVATION_S = 7 * 24 * 3600
+NB_SCANS_RECENTS = 10
+
+EN_COURS, TERMINE, ANNULE, INTERROMPU, ECHEC = "en_cours", "termine", "annule", "interrompu", "echec"
+REPRENABLES = (ANNULE, INTERROMPU, ECHEC)
+
+
+class GestionnaireScans:
+    """Scans du scanner exécutés en tâche de fond, persistés dans SQLite.
+
+    Chaque scan a un identifiant ; ses fiches sont enregistrées au fil de l'eau, ce qui permet d'afficher
+    un résultat partiel, d'annuler, puis de reprendre ou de rouvrir le scan après un rerun, un
+    rechargement de la page ou un redémarrage (seuls les joueurs manquants sont alors résolus).
+    """
+
+    def __init__(self, client, dossier=DOSSIER_DATA):
+        os.makedirs(dossier, exist_ok=True)
+        self.client = client
+        self._verrou = threading.Lock()
+        self._arrets = {}       # id -> threading.Event des scans qui tournent dans ce processus
+        self._profils = {}      # id -> Profil du dernier passage du scan dans ce processus
+        self._conn = sqlite3.connect(os.path.join(dossier, FICHIER_SCANS), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS scans (id TEXT PRIMARY KEY, statut TEXT NOT NULL, cree REAL NOT NULL, "
+            "maj REAL NOT NULL, joueurs TEXT NOT NULL, occurrences TEXT NOT NULL, infos TEXT NOT NULL, "
+            "force INTEGER NOT NULL DEFAULT 0, erreur TEXT NOT NULL DEFAULT '')"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS fiches (scan TEXT NOT NULL, idx INTEGER NOT NULL, fiche TEXT NOT NULL, "
+            "PRIMARY KEY (scan, idx))"
+        )
+        # Un scan « en cours » au démarrage a été coupé par l'arrêt du processus
+        self._conn.execute("UPDATE scans SET statut = ? WHERE statut = ?", (INTERROMPU, EN_COURS))
+        anciens = [r[0] for r in self._conn.execute(
+            "SELECT id FROM scans WHERE maj < ?", (time.time() - DUREE_CONSERVATION_S,)
+        ).fetchall()]
+        self._conn.executemany("DELETE FROM fiches WHERE scan = ?", [(i,) for i in anciens])
+        self._conn.executemany("DELETE FROM scans WHERE id = ?", [(i,) for i in anciens])
+        self._conn.commit()
+
+    # --- CYCLE DE VIE ---
+    def lancer(self, export, force=False):
+        """Crée un scan à partir d'un ResultatExport et le démarre. Retourne son identifiant."""
+        id_scan = uuid.uuid4().hex[:12]
+        infos = {"guildes": len(export.noms["Guild"]), "alliances": len(export.noms["Alliance"])}
+        with self._verrou:
+            self._conn.execute(
+                "INSERT INTO scans (id, statut, cree, maj, joueurs, occurrences, infos, force) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (id_scan, EN_COURS, time.time(), time.time(), json.dumps(export.joueurs, ensure_ascii=False),
+                 json.dumps(dict(export.occurrences["Player"]), ensure_ascii=False), json.dumps(infos), int(force)),
+            )
+            self._conn.commit()
+        self._demarrer(id_scan)
+        return id_scan
+
+    def reprendre(self, id_scan):
+        """Relance un scan annulé, interrompu ou en échec : seuls les joueurs sans fiche sont résolus."""
+        with self._verrou:
+            if id_scan in self._arrets:
+                return
+            self._maj_statut(id_scan, EN_COURS)
+        self._demarrer(id_scan)
+
+    def annuler(self, id_scan):
+        """Demande l'arrêt d'un scan ; les fiches déjà obtenues sont conservées."""
+        with self._verrou:
+            arret = self._arrets.get(id_scan)
+        if arret is not None:
+            arret.set()
+
+    def _maj_statut(self, id_scan, statut, erreur=""):
+        self._conn.execute(
+            "UPDATE scans SET statut = ?, erreur = ?, maj = ? WHERE id = ?", (statut, erreur, time.time(), id_scan)
+        )
+        self._conn.commit()
+
+    def _demarrer(self, id_scan):
+        with self._verrou:
+            joueurs, force = self._conn.execute("SELECT joueurs, force FROM scans WHERE id = ?", (id_scan,)).fetchone()
+            faits = {r[0] for r in self._conn.execute("SELECT idx FROM fiches WHERE scan = ?", (id_scan,)).fetchall()}
+            arret = self._arrets[id_scan] = threading.Event()
+        joueurs = json.loads(joueurs)
+        restants = [i for i in range(len(joueurs)) if i not in faits]
+        # Contexte neuf : le scan a son propre profil (requêtes gameinfo, latences, cache joueurs), écrit à la
+        # fin du scan dans le journal de performances ; les threads de résolution en héritent
+        contexte = contextvars.Context()
+        profil = contexte.run(demarrer_profil, f"scan-{id_scan}")
+        with self._verrou:
+            self._profils[id_scan] = profil
+
+        def enregistrer(i, fiche):
+            with self._verrou:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO fiches (scan, idx, fiche) VALUES (?, ?, ?)",
+                    (id_scan, restants[i], json.dumps(fiche, ensure_ascii=False)),
+                )
+                self._conn.execute("UPDATE scans SET maj = ? WHERE id = ?", (time.time(), id_scan))
+                self._conn.commit()
+
+        def executer():
+            statut, erreur = TERMINE, ""
+            try:
+                with etape("resolution_joueurs"):
+                    self.client.resoudre_joueurs([joueurs[i] for i in restants], force=bool(force),
+                                                 on_resultat=enregistrer, arret=arret)
+                if arret.is_set():
+                    statut = ANNULE
+            except Exception as e:
+                statut, erreur = ECHEC, str(e)
+            with self._verrou:
+                self._maj_statut(id_scan, statut, erreur)
+                self._arrets.pop(id_scan, None)
+            profil.infos.update(scan=id_scan, statut=statut, joueurs=len(restants))
+            ecrire_profil(profil)
+
+        threading.Thread(target=contexte.run, args=(executer,), name=f"scan-{id_scan}", daemon=True).start()
+
+    # --- LECTURE ---
+    def etat(self, id_scan):
+        """Statut et avancement d'un scan (None s'il n'existe pas ou plus)."""
+        with self._verrou:
+            row = self._conn.execute(
+                "SELECT statut, cree, joueurs, infos, erreur FROM scans WHERE id = ?", (id_scan,)
+            ).fetchone()
+            if row is None:
+                return None
+            nb_faits = self._conn.execute("SELECT COUNT(*) FROM fiches WHERE scan = ?", (id_scan,)).fetchone()[0]
+        statut, cree, joueurs, infos, erreur = row
+        return {"id": id_scan, "statut": statut, "cree": cree, "nb_total": len(json.loads(joueurs)),
+                "nb_faits": nb_faits, "erreur": erreur, **json.loads(infos)}
+
+    def resultats(self, id_scan):
+        """Fiches déjà résolues, dans l'ordre de l'export, avec leur nombre d'occurrences."""
+        with self._verrou:
+            occurrences = self._conn.execute("SELECT occurrences FROM scans WHERE id = ?", (id_scan,)).fetchone()
+            rows = self._conn.execute(
+                "SELECT fiche FROM fiches WHERE scan = ? ORDER BY idx", (id_scan,)
+            ).fetchall()
+        occurrences = json.loads(occurrences[0]) if occurrences else {}
+        fiches = []
+        for (fiche,) in rows:
+            fiche = json.loads(fiche)
+            fiche['Occurrences'] = occurrences.get(str(fiche.get('Pseudo', '')).lower(), 1)
+            fiches.append(fiche)
+        return fiches
+
+    def mesures(self, id_scan):
+        """Résumé du profil du scan (requêtes gameinfo, caches), s'il a tourné dans ce processus."""
+        with self._verrou:
+            profil = self._profils.get(id_scan)
+        return profil.resume() if profil is not None else None
+
+    def recents(self, nb=NB_SCANS_RECENTS):
+        """Derniers scans (plus récents d'abord), pour les rouvrir."""
+        with self._verrou:
+            ids = [r[0] for r in self._conn.execute("SELECT id FROM scans ORDER BY cree DESC LIMIT ?", (nb,)).fetchall()]
+        return [self.etat(i) for i in ids]
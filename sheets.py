@@ -0,0 +1,32 @@
+import os
+import json
+
+from config import NOM_DU_FICHIER_SHEET, FICHIER_COMPTE_SERVICE, FICHIER_SECRETS
+
+
+def lire_secrets(chemin=FICHIER_SECRETS):
+    """Secrets Streamlit (secrets.toml) lus sans Streamlit, pour la CLI. Dictionnaire vide si absent."""
+    if not os.path.exists(chemin):
+        return {}
+    import tomllib
+    with open(chemin, "rb") as f:
+        return tomllib.load(f)
+
+
+def ouvrir_classeur(infos_compte=None):
+    """Ouvre le classeur du journal.
+
+    Priorité au fichier service_account.json, puis aux informations de compte fournies, puis à la
+    variable d'environnement GCP_SERVICE_ACCOUNT et enfin à gcp_service_account dans secrets.toml.
+    """
+    import gspread
+    if os.path.exists(FICHIER_COMPTE_SERVICE):
+        gc = gspread.service_account(filename=FICHIER_COMPTE_SERVICE)
+    else:
+        if infos_compte is None:
+            brut = os.environ.get("GCP_SERVICE_ACCOUNT") or lire_secrets().get("gcp_service_account")
+            if not brut:
+                raise RuntimeError("Aucun compte de service Google : service_account.json, GCP_SERVICE_ACCOUNT ou secrets.toml")
+            infos_compte = json.loads(brut.strip()) if isinstance(brut, str) else dict(brut)
+        gc = gspread.service_account_from_dict(infos_compte)
+    return gc.open(NOM_DU_FICHIER_SHEET)